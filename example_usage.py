@@ -5,19 +5,14 @@ import sys
 from pathlib import Path
 from datetime import datetime, date
 
-# Add the project root to Python path
-project_root = Path(__file__).parent
-sys.path.insert(0, str(project_root))
-
-from py_reports.renderer import ReportGenerator
-from py_reports.config import get_settings
-
 def example_sales_report():
     """Example: Generate a sales report."""
     print("Example: Sales Report Generation")
     print("=" * 40)
     
     try:
+        from py_reports.renderer import ReportGenerator
+        
         # Create report generator
         generator = ReportGenerator(locale="en_US")
         
@@ -59,6 +54,8 @@ def example_inventory_report():
     print("=" * 40)
     
     try:
+        from py_reports.renderer import ReportGenerator
+        
         # Create report generator
         generator = ReportGenerator(locale="pl_PL")
         
@@ -260,4 +257,8 @@ def main():
         return 1
 
 if __name__ == "__main__":
+    # Add the project root to Python path
+    project_root = Path(__file__).parent
+    sys.path.insert(0, str(project_root))
+    
     sys.exit(main())
\ No newline at end of file
@@ -1,11 +1,19 @@
 """FastAPI REST API for PDF report generation."""
 
+import hashlib
+import json
 import logging
-from typing import Dict, Any, Optional, List
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Any, Optional, List, Tuple
 from pathlib import Path
 from datetime import datetime
+from tempfile import SpooledTemporaryFile
 from fastapi import FastAPI, HTTPException, Query, Body, File, UploadFile
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from io import BytesIO
 
@@ -22,19 +30,84 @@ app = FastAPI(
     description="Generate PDF reports from MongoDB data",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
-# Global report generator
-_generator: Optional[ReportGenerator] = None
+# PDFs up to this size stay in memory while streaming; larger ones spill to disk
+PDF_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+PDF_CHUNK_SIZE = 64 * 1024
+
+# Generated report files are reused for identical requests within this window
+REPORT_FILE_CACHE_TTL = 300
+REPORT_FILE_CACHE_SIZE = 64
+
+_report_files: "OrderedDict[Tuple[str, str], Tuple[float, Path]]" = OrderedDict()
+_report_files_lock = threading.Lock()
 
 
 def get_generator(locale: str = "en_US") -> ReportGenerator:
-    """Get report generator instance."""
-    global _generator
-    if _generator is None:
-        _generator = ReportGenerator(locale)
-    return _generator
+    """Get report generator instance for the locale."""
+    return _make_generator(locale)
+
+
+@lru_cache(maxsize=8)
+def _make_generator(locale: str) -> ReportGenerator:
+    """Create one report generator per locale."""
+    return ReportGenerator(locale)
+
+
+def _report_file_key(report_name: str, parameters: Dict[str, Any],
+                     locale: str) -> Tuple[str, str]:
+    """Build the report file cache key: the report name and a digest of parameters and locale."""
+    encoded = json.dumps([parameters, locale], sort_keys=True, default=str).encode('utf-8')
+    return report_name, hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def _cached_report_file(report_name: str, parameters: Dict[str, Any],
+                        locale: str) -> Optional[Path]:
+    """Get a recently generated report file for identical parameters, if any."""
+    key = _report_file_key(report_name, parameters, locale)
+    with _report_files_lock:
+        cached = _report_files.get(key)
+        if cached is None:
+            return None
+        
+        created_at, output_path = cached
+        if time.monotonic() - created_at > REPORT_FILE_CACHE_TTL or not output_path.exists():
+            del _report_files[key]
+            return None
+        
+        _report_files.move_to_end(key)
+        return output_path
+
+
+def _generate_report_file(report_name: str, parameters: Dict[str, Any],
+                          locale: str) -> Path:
+    """Generate a report into the output directory, reusing a recent identical one."""
+    output_path = _cached_report_file(report_name, parameters, locale)
+    if output_path is not None:
+        logger.info(f"Reusing generated report file: {output_path}")
+        return output_path
+    
+    settings = get_settings()
+    output_dir = Path(settings.output_dir)
+    output_dir.mkdir(exist_ok=True)
+    
+    # The digest keeps files for different parameters generated in the same second apart
+    key = _report_file_key(report_name, parameters, locale)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_path = output_dir / f"{report_name}_{timestamp}_{key[1][:8]}.pdf"
+    
+    get_generator(locale).generate_report(report_name, parameters, output_path)
+    
+    with _report_files_lock:
+        _report_files[key] = (time.monotonic(), output_path)
+        _report_files.move_to_end(key)
+        while len(_report_files) > REPORT_FILE_CACHE_SIZE:
+            _report_files.popitem(last=False)
+    
+    return output_path
 
 
 # Pydantic models
@@ -97,9 +170,11 @@ async def health_check():
     try:
         generator = get_generator()
         # Test MongoDB connection
-        mongodb_connected = generator.mongodb_client.connect()
-        if mongodb_connected:
-            generator.mongodb_client.disconnect()
+        mongodb_client = generator.mongodb_client
+        mongodb_connected = (
+            await run_in_threadpool(mongodb_client.connect)
+            and await run_in_threadpool(mongodb_client.ping)
+        )
         
         return {
             "status": "healthy",
@@ -116,7 +191,7 @@ async def list_reports():
     """List all available reports."""
     try:
         generator = get_generator()
-        reports = generator.list_available_reports()
+        reports = await run_in_threadpool(generator.list_available_reports)
         return reports
     except Exception as e:
         logger.error(f"Failed to list reports: {e}")
@@ -128,7 +203,7 @@ async def get_report_info(report_name: str):
     """Get detailed information about a report."""
     try:
         generator = get_generator()
-        info = generator.get_report_info(report_name)
+        info = await run_in_threadpool(generator.get_report_info, report_name)
         
         if 'error' in info:
             raise HTTPException(status_code=404, detail=info['error'])
@@ -146,7 +221,7 @@ async def validate_report(report_name: str):
     """Validate report configuration."""
     try:
         generator = get_generator()
-        validation = generator.validate_report_config(report_name)
+        validation = await run_in_threadpool(generator.validate_report_config, report_name)
         
         return ValidationResponse(**validation)
     except Exception as e:
@@ -166,17 +241,11 @@ async def render_report(
         
         if output_format == "file":
             # Generate to file
-            settings = get_settings()
-            output_dir = Path(settings.output_dir)
-            output_dir.mkdir(exist_ok=True)
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_path = output_dir / f"{report_name}_{timestamp}.pdf"
-            
-            result = generator.generate_report(
+            output_path = await run_in_threadpool(
+                _generate_report_file,
                 report_name, 
                 params.parameters, 
-                output_path
+                params.locale
             )
             
             file_size = output_path.stat().st_size
@@ -191,7 +260,8 @@ async def render_report(
             )
         else:
             # Generate to bytes
-            pdf_bytes = generator.generate_report(
+            pdf_bytes = await run_in_threadpool(
+                generator.generate_report,
                 report_name, 
                 params.parameters
             )
@@ -217,18 +287,41 @@ async def download_report(
 ):
     """Generate and download a report as PDF file."""
     try:
+        filename = f"{report_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        
+        # Serve a file generated moments ago for the same request as-is
+        cached_path = _cached_report_file(report_name, params.parameters, params.locale)
+        if cached_path is not None:
+            return FileResponse(
+                path=cached_path,
+                filename=filename,
+                media_type="application/pdf"
+            )
+        
         generator = get_generator(params.locale)
-        pdf_bytes = generator.generate_report(report_name, params.parameters)
+        
+        # Render into a spooled buffer so large PDFs are not held twice in memory
+        buffer = SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_SIZE)
+        try:
+            await run_in_threadpool(
+                generator.generate_report, report_name, params.parameters, buffer
+            )
+        except Exception:
+            buffer.close()
+            raise
+        buffer.seek(0)
         
         # Create streaming response
         def iter_pdf():
-            yield pdf_bytes
+            with buffer:
+                while chunk := buffer.read(PDF_CHUNK_SIZE):
+                    yield chunk
         
         return StreamingResponse(
             iter_pdf(),
             media_type="application/pdf",
             headers={
-                "Content-Disposition": f"attachment; filename={report_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+                "Content-Disposition": f"attachment; filename={filename}"
             }
         )
     
@@ -245,7 +338,9 @@ async def test_report(
     """Test report generation without saving output."""
     try:
         generator = get_generator(params.locale)
-        result = generator.test_report_generation(report_name, params.parameters)
+        result = await run_in_threadpool(
+            generator.test_report_generation, report_name, params.parameters
+        )
         
         return result
     except Exception as e:
@@ -262,7 +357,7 @@ async def get_sample_data(
     """Get sample data for a report."""
     try:
         generator = get_generator(locale)
-        result = generator.generate_sample_data(report_name, size)
+        result = await run_in_threadpool(generator.generate_sample_data, report_name, size)
         
         return result
     except Exception as e:
@@ -277,21 +372,14 @@ async def get_report_file(
 ):
     """Generate report and return file path for download."""
     try:
-        generator = get_generator(params.locale)
-        
         # Generate to file
-        settings = get_settings()
-        output_dir = Path(settings.output_dir)
-        output_dir.mkdir(exist_ok=True)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_path = output_dir / f"{report_name}_{timestamp}.pdf"
-        
-        generator.generate_report(report_name, params.parameters, output_path)
+        output_path = await run_in_threadpool(
+            _generate_report_file, report_name, params.parameters, params.locale
+        )
         
         return FileResponse(
             path=output_path,
-            filename=f"{report_name}_{timestamp}.pdf",
+            filename=output_path.name,
             media_type="application/pdf"
         )
     
@@ -317,10 +405,11 @@ async def startup_event():
     """Initialize application on startup."""
     logger.info("PDF Reports Generator API starting up")
     try:
-        # Test MongoDB connection
         generator = get_generator()
+        generator.warmup()
+        
+        # Test MongoDB connection and keep its pool open for requests
         if generator.mongodb_client.connect():
-            generator.mongodb_client.disconnect()
             logger.info("MongoDB connection test successful")
         else:
             logger.warning("MongoDB connection test failed")
@@ -332,6 +421,7 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown."""
     logger.info("PDF Reports Generator API shutting down")
+    get_generator().mongodb_client.disconnect()
 
 
 if __name__ == "__main__":
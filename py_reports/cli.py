@@ -2,12 +2,14 @@
 
 import logging
 import sys
+import time
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import TYPE_CHECKING, Optional, Dict, Any, Tuple
 import click
-from datetime import datetime
-from .renderer import ReportGenerator
-from .config import get_settings
+
+if TYPE_CHECKING:
+    from .renderer import ReportGenerator
 
 # Configure logging
 logging.basicConfig(
@@ -16,6 +18,49 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Timestamp suffix of reports written to the default output directory
+_TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+
+def _parse_params(params: Tuple[str, ...], warn_invalid: bool = True) -> Dict[str, str]:
+    """Parse key=value report parameters."""
+    parameters = {}
+    for param in params:
+        key, separator, value = param.partition('=')
+        if separator:
+            parameters[key] = value
+        elif warn_invalid:
+            click.echo(f"Warning: Invalid parameter format: {param}", err=True)
+    return parameters
+
+
+@lru_cache(maxsize=8)
+def _get_generator(locale: str) -> "ReportGenerator":
+    """Get report generator for the locale, created once per process."""
+    # Imported here so commands like --help and version skip loading the
+    # renderer stack (WeasyPrint, Jinja2, pymongo)
+    from .renderer import ReportGenerator
+    return ReportGenerator(locale)
+
+
+def _dump_record(record: Dict[str, Any]) -> str:
+    """Serialize a MongoDB document as indented JSON for display."""
+    import orjson
+    return orjson.dumps(
+        record,
+        default=str,
+        option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+    ).decode('utf-8')
+
+
+@lru_cache(maxsize=1)
+def _default_output_dir() -> Path:
+    """Get the configured output directory, creating it once per process."""
+    from .config import get_settings
+    output_dir = Path(get_settings().output_dir)
+    output_dir.mkdir(exist_ok=True)
+    return output_dir
+
 
 @click.group()
 @click.option('--verbose', '-v', is_flag=True, help='Enable verbose logging')
@@ -41,16 +86,10 @@ def run(ctx, report_name, params, locale, output, validate_only):
     """Generate a report."""
     try:
         # Parse parameters
-        parameters = {}
-        for param in params:
-            if '=' in param:
-                key, value = param.split('=', 1)
-                parameters[key] = value
-            else:
-                click.echo(f"Warning: Invalid parameter format: {param}", err=True)
+        parameters = _parse_params(params)
         
         # Create report generator
-        generator = ReportGenerator(locale)
+        generator = _get_generator(locale)
         
         if validate_only:
             # Validate report configuration
@@ -77,12 +116,8 @@ def run(ctx, report_name, params, locale, output, validate_only):
                 click.echo(f"✓ Report saved to: {output_path}")
             else:
                 # Generate to default output directory
-                settings = get_settings()
-                output_dir = Path(settings.output_dir)
-                output_dir.mkdir(exist_ok=True)
-                
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                output_path = output_dir / f"{report_name}_{timestamp}.pdf"
+                timestamp = time.strftime(_TIMESTAMP_FORMAT)
+                output_path = _default_output_dir() / f"{report_name}_{timestamp}.pdf"
                 
                 result = generator.generate_report(report_name, parameters, output_path)
                 click.echo(f"✓ Report saved to: {output_path}")
@@ -100,7 +135,7 @@ def run(ctx, report_name, params, locale, output, validate_only):
 def list_reports(locale):
     """List available reports."""
     try:
-        generator = ReportGenerator(locale)
+        generator = _get_generator(locale)
         reports = generator.list_available_reports()
         
         if not reports:
@@ -126,7 +161,7 @@ def list_reports(locale):
 def info(report_name, locale):
     """Show detailed information about a report."""
     try:
-        generator = ReportGenerator(locale)
+        generator = _get_generator(locale)
         info = generator.get_report_info(report_name)
         
         if 'error' in info:
@@ -159,13 +194,9 @@ def test(report_name, params, locale):
     """Test report generation without saving output."""
     try:
         # Parse parameters
-        parameters = {}
-        for param in params:
-            if '=' in param:
-                key, value = param.split('=', 1)
-                parameters[key] = value
+        parameters = _parse_params(params, warn_invalid=False)
         
-        generator = ReportGenerator(locale)
+        generator = _get_generator(locale)
         result = generator.test_report_generation(report_name, parameters)
         
         if result['success']:
@@ -188,7 +219,7 @@ def test(report_name, params, locale):
 def sample(report_name, size, locale):
     """Generate sample data for a report."""
     try:
-        generator = ReportGenerator(locale)
+        generator = _get_generator(locale)
         result = generator.generate_sample_data(report_name, size)
         
         if result['success']:
@@ -200,7 +231,7 @@ def sample(report_name, size, locale):
             if result['sample_data']:
                 click.echo("\nFirst 3 records:")
                 for i, record in enumerate(result['sample_data'][:3]):
-                    click.echo(f"  Record {i+1}: {record}")
+                    click.echo(f"  Record {i+1}: {_dump_record(record)}")
         else:
             click.echo(f"✗ Error generating sample data: {result['error']}", err=True)
             sys.exit(1)
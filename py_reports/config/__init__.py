@@ -1,6 +1,6 @@
 """Configuration management for PDF reports generator."""
 
 from .settings import Settings, get_settings
-from .report_config import ReportConfig, load_report_config
+from .report_config import ReportConfig, load_report_config, clear_report_config_cache
 
-__all__ = ["Settings", "get_settings", "ReportConfig", "load_report_config"]
\ No newline at end of file
+__all__ = ["Settings", "get_settings", "ReportConfig", "load_report_config", "clear_report_config_cache"]
\ No newline at end of file
@@ -2,14 +2,24 @@
 
 import os
 import yaml
-from typing import Dict, List, Any, Optional, Union
+from functools import lru_cache
+from typing import Callable, Dict, List, Any, Optional, Tuple, Union
 from pathlib import Path
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+# Use the libyaml-backed loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as YamlSafeLoader
+except ImportError:
+    from yaml import SafeLoader as YamlSafeLoader
 
 
 class ColumnConfig(BaseModel):
     """Column configuration for tables."""
     
+    # Instances are interned and shared between reports, so they are read-only
+    model_config = ConfigDict(frozen=True)
+    
     label: str = Field(..., description="Column label key for translation")
     field: str = Field(..., description="MongoDB field name")
     type: str = Field(default="string", description="Data type (string, number, date, currency)")
@@ -18,6 +28,22 @@ class ColumnConfig(BaseModel):
     width: Optional[str] = Field(default=None, description="Column width (CSS value)")
     wrap: bool = Field(default=True, description="Enable text wrapping")
     ellipsis: bool = Field(default=True, description="Show ellipsis for long text")
+    
+    @classmethod
+    def interned(cls, data: Dict[str, Any]) -> "ColumnConfig":
+        """Get a shared instance for a column definition, building it on first use."""
+        key = tuple((name, data[name]) for name in cls.model_fields if name in data)
+        try:
+            return _intern_column_config(key)
+        except TypeError:
+            # Unhashable values cannot be interned
+            return cls(**data)
+
+
+@lru_cache(maxsize=1024)
+def _intern_column_config(key: Tuple[Tuple[str, Any], ...]) -> ColumnConfig:
+    """Build the ColumnConfig for a hashable (field, value) key."""
+    return ColumnConfig(**dict(key))
 
 
 class PivotConfig(BaseModel):
@@ -72,9 +98,19 @@ class HeaderFooterConfig(BaseModel):
     environment: Optional[str] = Field(default=None, description="Environment identifier")
 
 
+class MaterializeConfig(BaseModel):
+    """Materialized result collection configuration."""
+    
+    collection: str = Field(..., description="Collection the pipeline results are written to")
+    ttl_seconds: int = Field(default=3600, description="Seconds before materialized results are rebuilt")
+
+
 class ReportConfig(BaseModel):
     """Complete report configuration."""
     
+    # Loaded configs are cached and shared, so they are read-only
+    model_config = ConfigDict(frozen=True, validate_assignment=False)
+    
     name: str = Field(..., description="Report name")
     description: str = Field(default="", description="Report description")
     collection: str = Field(..., description="MongoDB collection name")
@@ -92,8 +128,36 @@ class ReportConfig(BaseModel):
     header: Optional[HeaderFooterConfig] = Field(default=None, description="Header configuration")
     footer: Optional[HeaderFooterConfig] = Field(default=None, description="Footer configuration")
     
+    # Results
+    materialize: Optional[MaterializeConfig] = Field(
+        default=None,
+        description="Serve the main pipeline from a periodically rebuilt collection"
+    )
+    
+    required_fields: Optional[List[str]] = Field(
+        default=None,
+        description="Fields the report reads from the main query; others are projected away early"
+    )
+    
+    count_only: bool = Field(
+        default=False,
+        description="Only count the main query's documents; main_data then holds no rows"
+    )
+    
+    # Indexes
+    hint: Optional[Union[str, Dict[str, Any]]] = Field(
+        default=None,
+        description="Index the main pipeline runs with: an index name or key specification"
+    )
+    indexes: Optional[List[str]] = Field(
+        default=None,
+        description="Indexed fields of the collection; filters on them are moved to the start"
+    )
+    
     # Subreports
     subreports: List[SubreportConfig] = Field(default=[], description="Subreports")
+    parallel_subreports: bool = Field(default=False, description="Run subreport queries concurrently")
+    faceted_subreports: bool = Field(default=False, description="Run subreport queries as one $facet query")
     
     # Parameters
     parameters: Dict[str, Dict[str, Any]] = Field(
@@ -104,37 +168,131 @@ class ReportConfig(BaseModel):
     # Styling
     css_file: Optional[str] = Field(default=None, description="Custom CSS file")
     
-    @validator('pipeline')
+    def projected_fields(self) -> Optional[Dict[str, int]]:
+        """Build a find projection covering the table columns, or None for all fields."""
+        if not self.columns:
+            return None
+        return {column.field: 1 for column in self.columns}
+    
+    def build_row_extractor(self) -> Callable[[Dict[str, Any]], Tuple[Any, ...]]:
+        """Get a function returning the value of every column field of a document."""
+        return compile_row_extractor(tuple(column.field for column in self.columns))
+    
+    @field_validator('columns', mode='before')
+    @classmethod
+    def intern_columns(cls, v):
+        """Reuse identical column definitions instead of building a model for each."""
+        if not isinstance(v, list):
+            return v
+        
+        columns = []
+        for column in v:
+            if isinstance(column, dict):
+                try:
+                    column = ColumnConfig.interned(column)
+                except ValidationError:
+                    # Leave it to field validation, which reports the column index
+                    pass
+            columns.append(column)
+        return columns
+    
+    @field_validator('pipeline', mode='after')
+    @classmethod
     def validate_pipeline(cls, v):
         """Validate that pipeline is a list of dictionaries."""
-        if not isinstance(v, list):
+        # Field validation has already built plain lists and dicts, so exact
+        # type checks suffice and the stage check runs as a single all()
+        if type(v) is not list:
             raise ValueError("Pipeline must be a list")
-        for stage in v:
-            if not isinstance(stage, dict):
-                raise ValueError("Each pipeline stage must be a dictionary")
+        if not all(type(stage) is dict for stage in v):
+            raise ValueError("Each pipeline stage must be a dictionary")
         return v
 
 
+def _get_nested_value(data: Any, parts: Tuple[str, ...]) -> Any:
+    """Follow a dotted field path through nested dicts, or return None."""
+    for part in parts:
+        if isinstance(data, dict) and part in data:
+            data = data[part]
+        else:
+            return None
+    return data
+
+
+@lru_cache(maxsize=256)
+def compile_row_extractor(fields: Tuple[str, ...]) -> Callable[[Dict[str, Any]], Tuple[Any, ...]]:
+    """
+    Compile a function returning the values of fields from a document.
+    
+    The generated function is straight-line code, e.g. for ("a", "b.c"):
+    ``lambda doc: (doc.get('a'), _nested(doc, ('b', 'c')))``, so rows are
+    read without looping over the column list per document. Dotted fields
+    follow nested dicts and yield None when a level is missing.
+    """
+    expressions = []
+    for field in fields:
+        parts = tuple(field.split('.'))
+        if len(parts) == 1:
+            expressions.append(f"doc.get({field!r})")
+        else:
+            expressions.append(f"_nested(doc, {parts!r})")
+    
+    # A trailing comma keeps single-column extractors returning a tuple
+    source = f"lambda doc: ({''.join(expression + ', ' for expression in expressions)})"
+    return eval(compile(source, "<row_extractor>", "eval"), {"_nested": _get_nested_value})
+
+
 def load_report_config(report_name: str, reports_dir: str = "reports") -> ReportConfig:
-    """Load report configuration from YAML file."""
+    """
+    Load report configuration from YAML file.
+    
+    Parsed configurations are cached until the file's modification time
+    changes, so the returned instance is shared and must not be mutated.
+    """
     config_path = Path(reports_dir) / f"{report_name}.yaml"
     
-    if not config_path.exists():
-        raise FileNotFoundError(f"Report configuration not found: {config_path}")
+    try:
+        mtime_ns = os.stat(config_path).st_mtime_ns
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Report configuration not found: {config_path}") from None
     
+    return _load_report_config_cached(str(config_path), mtime_ns)
+
+
+@lru_cache(maxsize=256)
+def _load_report_config_cached(config_path: str, mtime_ns: int) -> ReportConfig:
+    """Parse and validate a report configuration file (mtime_ns keys the cache)."""
     with open(config_path, 'r', encoding='utf-8') as f:
-        config_data = yaml.safe_load(f)
+        config_data = yaml.load(f, Loader=YamlSafeLoader)
     
     return ReportConfig(**config_data)
 
 
 def list_available_reports(reports_dir: str = "reports") -> List[str]:
     """List all available report configurations."""
-    reports_path = Path(reports_dir)
-    if not reports_path.exists():
+    try:
+        mtime_ns = os.stat(reports_dir).st_mtime_ns
+    except OSError:
         return []
     
-    return [
-        f.stem for f in reports_path.glob("*.yaml")
-        if f.is_file()
-    ]
\ No newline at end of file
+    return list(_list_available_reports_cached(reports_dir, mtime_ns))
+
+
+@lru_cache(maxsize=16)
+def _list_available_reports_cached(reports_dir: str, mtime_ns: int) -> tuple:
+    """List report configurations; the directory's mtime_ns keys the cache."""
+    try:
+        # scandir entries carry their file type, so no stat() per file is needed
+        with os.scandir(reports_dir) as entries:
+            return tuple(
+                entry.name[:-5] for entry in entries
+                if entry.name.endswith('.yaml') and entry.is_file()
+            )
+    except (FileNotFoundError, NotADirectoryError):
+        return ()
+
+
+def clear_report_config_cache() -> None:
+    """Drop cached report configurations and report listings."""
+    _load_report_config_cached.cache_clear()
+    _list_available_reports_cached.cache_clear()
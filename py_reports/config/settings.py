@@ -1,106 +1,113 @@
 """Application settings and configuration."""
 
 import os
+from functools import lru_cache
 from typing import Optional
 from pydantic import Field
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
-    """Application settings."""
+    """
+    Application settings.
+    
+    Each field is read from the environment variable of the same name
+    (case-insensitive), e.g. MONGODB_URL for mongodb_url.
+    """
+    
+    # Settings are shared process-wide, so they are read-only
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        case_sensitive=False,
+        extra="ignore",
+        frozen=True,
+    )
     
     # MongoDB settings
     mongodb_url: str = Field(
         default="mongodb://wro4.ppo.enigma.com.pl:27017",
-        env="MONGODB_URL",
         description="MongoDB connection URL"
     )
     mongodb_database: str = Field(
         default="Person",
-        env="MONGODB_DATABASE",
         description="MongoDB database name"
     )
     mongodb_username: Optional[str] = Field(
         default=None,
-        env="MONGODB_USERNAME",
         description="MongoDB username"
     )
     mongodb_password: Optional[str] = Field(
         default=None,
-        env="MONGODB_PASSWORD",
         description="MongoDB password"
     )
     
     # Report settings
     reports_dir: str = Field(
         default="reports",
-        env="REPORTS_DIR",
         description="Directory containing report definitions"
     )
     templates_dir: str = Field(
         default="py_reports/templates",
-        env="TEMPLATES_DIR",
         description="Directory containing Jinja2 templates"
     )
     translations_dir: str = Field(
         default="py_reports/translations",
-        env="TRANSLATIONS_DIR",
         description="Directory containing translation files"
     )
     output_dir: str = Field(
         default="output",
-        env="OUTPUT_DIR",
         description="Directory for generated reports"
     )
     
     # Performance settings
     max_rows_per_table: int = Field(
         default=100000,
-        env="MAX_ROWS_PER_TABLE",
         description="Maximum rows per table"
     )
     max_columns_per_pivot: int = Field(
         default=200,
-        env="MAX_COLUMNS_PER_PIVOT",
         description="Maximum columns per pivot table"
     )
     max_generation_time: int = Field(
         default=60,
-        env="MAX_GENERATION_TIME",
         description="Maximum report generation time in seconds"
     )
+    aggregation_cache_ttl: int = Field(
+        default=0,
+        description="Seconds to reuse identical aggregation results (0 disables caching)"
+    )
+    aggregation_cache_size: int = Field(
+        default=128,
+        description="Maximum number of cached aggregation results"
+    )
+    template_bytecode_cache: bool = Field(
+        default=True,
+        description="Keep compiled templates on disk so they are reused across runs"
+    )
+    template_bytecode_cache_dir: Optional[str] = Field(
+        default=None,
+        description="Directory for compiled templates (defaults to a per-user temp directory)"
+    )
     
     # API settings
     api_host: str = Field(
         default="0.0.0.0",
-        env="API_HOST",
         description="API server host"
     )
     api_port: int = Field(
         default=8000,
-        env="API_PORT",
         description="API server port"
     )
     
     # Logging
     log_level: str = Field(
         default="INFO",
-        env="LOG_LEVEL",
         description="Logging level"
     )
-    
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
-
-
-# Global settings instance
-_settings: Optional[Settings] = None
 
 
+@lru_cache(maxsize=None)
 def get_settings() -> Settings:
-    """Get application settings (singleton pattern)."""
-    global _settings
-    if _settings is None:
-        _settings = Settings()
-    return _settings
\ No newline at end of file
+    """Get application settings, loaded once per process."""
+    return Settings()
@@ -1,15 +1,67 @@
 """MongoDB client wrapper with connection management."""
 
+import hashlib
 import logging
-from typing import Optional, Dict, Any, List
-from pymongo import MongoClient
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Set, Tuple, Union
+from bson.codec_options import DEFAULT_CODEC_OPTIONS, TypeDecoder, TypeRegistry
+from bson import json_util
+from bson.decimal128 import Decimal128
+from bson.json_util import CANONICAL_JSON_OPTIONS
+from pymongo import MongoClient, ReturnDocument
 from pymongo.database import Database
 from pymongo.collection import Collection
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+from pymongo.errors import ConnectionFailure, OperationFailure, ServerSelectionTimeoutError
 from ..config.settings import get_settings
 
 logger = logging.getLogger(__name__)
 
+# Documents fetched per getMore round-trip
+DEFAULT_BATCH_SIZE = 1000
+
+# Bookkeeping fields added to materialized result documents; the run marker
+# of each pipeline key also holds MATERIALIZED_AT_FIELD
+MATERIALIZED_AT_FIELD = "_generatedAt"
+MATERIALIZED_KEY_FIELD = "_pipelineKey"
+# Holds a result document's own _id; stored documents get a fresh one, as
+# pipelines like $unwind can output the same _id more than once
+MATERIALIZED_ID_FIELD = "_sourceId"
+
+
+class _Decimal128Decoder(TypeDecoder):
+    """Decode Decimal128 values to Decimal while the BSON is being read."""
+    
+    bson_type = Decimal128
+    
+    def transform_bson(self, value: Decimal128) -> Decimal:
+        return value.to_decimal()
+
+
+# Codec options for the report database; numeric Decimal128 fields arrive as
+# Decimal so result processing converts them to floats instead of strings
+CODEC_OPTIONS = DEFAULT_CODEC_OPTIONS.with_options(
+    type_registry=TypeRegistry([_Decimal128Decoder()])
+)
+
+# Index to run an aggregation with: an index name or a key specification
+IndexHint = Union[str, Dict[str, Any], List[Tuple[str, Any]]]
+
+def _tagged_value(value: Any) -> Dict[str, str]:
+    """Encode a non-BSON value for cache keys, keeping its type apart from its text."""
+    return {"$pyType": type(value).__qualname__, "$value": str(value)}
+
+
+# Connection pool options shared by every report generated in the process
+POOL_OPTIONS = {
+    'maxPoolSize': 50,
+    'minPoolSize': 5,
+    'maxIdleTimeMS': 60000,
+}
+
 
 class MongoDBClient:
     """MongoDB client wrapper with connection management and error handling."""
@@ -21,15 +73,30 @@ class MongoDBClient:
         self._client: Optional[MongoClient] = None
         self._database: Optional[Database] = None
         self._connected = False
+        
+        # Aggregation results keyed by a hash of collection and pipeline
+        self._result_cache: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._result_cache_lock = threading.Lock()
+        
+        # Materialized collections whose indexes have been created
+        self._materialized_collections: Set[str] = set()
     
     def connect(self) -> bool:
-        """Establish connection to MongoDB."""
+        """
+        Establish connection to MongoDB.
+        
+        An existing connection is reused so its pool stays warm across reports.
+        """
+        if self.is_connected():
+            return True
+        
         try:
             # Build connection options
             connection_options = {
                 'serverSelectionTimeoutMS': 5000,
                 'connectTimeoutMS': 5000,
                 'socketTimeoutMS': 5000,
+                **POOL_OPTIONS,
             }
             
             # Add authentication if provided
@@ -46,7 +113,7 @@ class MongoDBClient:
             
             # Test connection
             self._client.admin.command('ping')
-            self._database = self._client[self.database_name]
+            self._database = self._client.get_database(self.database_name, codec_options=CODEC_OPTIONS)
             self._connected = True
             
             logger.info(f"Successfully connected to MongoDB: {self.database_name}")
@@ -65,20 +132,29 @@ class MongoDBClient:
         """Close MongoDB connection."""
         if self._client:
             self._client.close()
+            self._client = None
+            self._database = None
             self._connected = False
             logger.info("Disconnected from MongoDB")
     
     def is_connected(self) -> bool:
-        """Check if client is connected to MongoDB."""
-        if not self._connected or not self._client:
+        """
+        Check if client has been connected to MongoDB.
+        
+        No round-trip is made; server failures surface from pymongo as
+        ServerSelectionTimeoutError on the next operation.
+        """
+        return self._connected and self._client is not None
+    
+    def ping(self) -> bool:
+        """Check that the server is reachable with a round-trip ping."""
+        if not self.is_connected():
             return False
         
         try:
-            # Test connection
             self._client.admin.command('ping')
             return True
         except Exception:
-            self._connected = False
             return False
     
     def get_database(self) -> Database:
@@ -92,19 +168,34 @@ class MongoDBClient:
         database = self.get_database()
         return database[collection_name]
     
-    def execute_aggregation(self, collection_name: str, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def execute_aggregation(self, collection_name: str, pipeline: List[Dict[str, Any]],
+                            bypass_cache: bool = False,
+                            hint: Optional[IndexHint] = None,
+                            batch_size: int = DEFAULT_BATCH_SIZE) -> List[Dict[str, Any]]:
         """
         Execute aggregation pipeline on a collection.
         
+        Results are reused for identical pipelines for
+        settings.aggregation_cache_ttl seconds when caching is enabled.
+        
         Args:
             collection_name: Name of the collection
             pipeline: MongoDB aggregation pipeline
+            bypass_cache: Always run the pipeline and do not cache its result
+            hint: Index the server should use for the pipeline
+            batch_size: Documents fetched per round-trip
             
         Returns:
             List of documents from aggregation result
         """
-        if not self.is_connected():
-            raise ConnectionError("Not connected to MongoDB")
+        use_cache = self.settings.aggregation_cache_ttl > 0 and not bypass_cache
+        if use_cache:
+            cache_key = self._aggregation_cache_key(collection_name, pipeline)
+            cached_results = self._get_cached_results(cache_key)
+            if cached_results is not None:
+                logger.info(f"Aggregation cache hit on {collection_name}, "
+                            f"returned {len(cached_results)} documents")
+                return cached_results
         
         try:
             collection = self.get_collection(collection_name)
@@ -114,18 +205,212 @@ class MongoDBClient:
             for i, stage in enumerate(pipeline[:3]):
                 logger.debug(f"Pipeline stage {i+1}: {stage}")
             
-            cursor = collection.aggregate(pipeline)
+            cursor = collection.aggregate(pipeline, batchSize=batch_size, **self._hint_options(hint))
             results = list(cursor)
             
             logger.info(f"Aggregation completed, returned {len(results)} documents")
+            
+            if use_cache:
+                self._cache_results(cache_key, results)
             return results
             
         except Exception as e:
             logger.error(f"Failed to execute aggregation on {collection_name}: {e}")
             raise
     
+    def iter_aggregation(self, collection_name: str, pipeline: List[Dict[str, Any]],
+                         batch_size: int = DEFAULT_BATCH_SIZE,
+                         hint: Optional[IndexHint] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream aggregation results without materializing the whole result set.
+        
+        When the aggregation cache is enabled results go through
+        execute_aggregation so they can be cached and reused.
+        
+        Args:
+            collection_name: Name of the collection
+            pipeline: MongoDB aggregation pipeline
+            batch_size: Documents fetched per round-trip
+            hint: Index the server should use for the pipeline
+            
+        Yields:
+            Documents from aggregation result
+        """
+        if self.settings.aggregation_cache_ttl > 0:
+            yield from self.execute_aggregation(collection_name, pipeline, hint=hint, batch_size=batch_size)
+            return
+        
+        collection = self.get_collection(collection_name)
+        logger.info(f"Streaming aggregation on {collection_name} with {len(pipeline)} stages")
+        
+        with collection.aggregate(pipeline, batchSize=batch_size, allowDiskUse=True,
+                                  **self._hint_options(hint)) as cursor:
+            yield from cursor
+    
+    def execute_materialized_aggregation(self, collection_name: str, pipeline: List[Dict[str, Any]],
+                                         target_collection: str, ttl_seconds: int,
+                                         hint: Optional[IndexHint] = None,
+                                         batch_size: int = DEFAULT_BATCH_SIZE) -> List[Dict[str, Any]]:
+        """
+        Serve aggregation results from a materialized collection.
+        
+        Every pipeline (including its parameter values) writes its results to
+        target_collection with $merge, tagged with the pipeline key and the
+        run's timestamp. A marker document per pipeline key, with the key as
+        its _id, records the latest run, so pipelines returning no rows are
+        still fresh. The pipeline is re-run only when the marker is older than
+        ttl_seconds; otherwise results come from a plain find.
+        
+        Args:
+            collection_name: Name of the source collection
+            pipeline: MongoDB aggregation pipeline
+            target_collection: Collection holding the materialized results
+            ttl_seconds: Maximum age of materialized results
+            hint: Index the server should use when re-running the pipeline
+            batch_size: Documents fetched per round-trip from the materialized collection
+            
+        Returns:
+            List of documents from aggregation result
+        """
+        database = self.get_database()
+        target = database[target_collection]
+        pipeline_key = self._aggregation_cache_key(collection_name, pipeline)
+        
+        try:
+            self._ensure_materialized_indexes(target, ttl_seconds)
+            
+            now = datetime.now(timezone.utc)
+            marker = target.find_one(
+                {"_id": pipeline_key, MATERIALIZED_AT_FIELD: {"$gt": now - timedelta(seconds=ttl_seconds)}}
+            )
+            
+            if marker is not None:
+                generated_at = marker[MATERIALIZED_AT_FIELD]
+            else:
+                logger.info(f"Materializing aggregation on {collection_name} into {target_collection}")
+                # BSON dates hold milliseconds, so truncate to match what is stored
+                generated_at = now.replace(microsecond=now.microsecond // 1000 * 1000)
+                materialize_stages = [
+                    {"$addFields": {
+                        MATERIALIZED_ID_FIELD: "$_id",
+                        MATERIALIZED_AT_FIELD: generated_at,
+                        MATERIALIZED_KEY_FIELD: pipeline_key,
+                    }},
+                    # Documents without _id get a fresh one, so every row is inserted
+                    {"$project": {"_id": 0}},
+                    {"$merge": {
+                        "into": target_collection,
+                        "whenMatched": "fail",
+                        "whenNotMatched": "insert",
+                    }},
+                ]
+                database[collection_name].aggregate(
+                    pipeline + materialize_stages, allowDiskUse=True, **self._hint_options(hint)
+                ).close()
+                
+                # $max keeps the marker of a newer concurrent run, whose
+                # complete results are then read instead of this run's
+                marker = target.find_one_and_update(
+                    {"_id": pipeline_key},
+                    {"$max": {MATERIALIZED_AT_FIELD: generated_at}},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+                generated_at = marker[MATERIALIZED_AT_FIELD]
+                target.delete_many(
+                    {MATERIALIZED_KEY_FIELD: pipeline_key, MATERIALIZED_AT_FIELD: {"$lt": generated_at}}
+                )
+            
+            # $merge inserts documents in pipeline order, so natural order preserves any $sort
+            cursor = target.find(
+                {MATERIALIZED_KEY_FIELD: pipeline_key, MATERIALIZED_AT_FIELD: generated_at},
+                {MATERIALIZED_AT_FIELD: 0, MATERIALIZED_KEY_FIELD: 0},
+                sort=[("$natural", 1)],
+                batch_size=batch_size
+            )
+            results = [self._restore_source_id(document) for document in cursor]
+            
+            logger.info(f"Materialized aggregation returned {len(results)} documents")
+            return results
+            
+        except Exception as e:
+            logger.error(f"Failed to execute materialized aggregation on {collection_name}: {e}")
+            raise
+    
+    def _restore_source_id(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Give a materialized document back the _id the pipeline output, if any."""
+        if MATERIALIZED_ID_FIELD in document:
+            document["_id"] = document.pop(MATERIALIZED_ID_FIELD)
+        else:
+            del document["_id"]
+        return document
+    
+    def _hint_options(self, hint: Optional[IndexHint]) -> Dict[str, Any]:
+        """Build the aggregate() keyword arguments for an index hint."""
+        if hint is None:
+            return {}
+        logger.debug(f"Using index hint {hint}")
+        return {"hint": hint}
+    
+    def _ensure_materialized_indexes(self, target: Collection, ttl_seconds: int) -> None:
+        """Create the lookup and TTL indexes of a materialized collection once per client."""
+        if target.name in self._materialized_collections:
+            return
+        
+        target.create_index([(MATERIALIZED_KEY_FIELD, 1), (MATERIALIZED_AT_FIELD, 1)])
+        try:
+            # Results are only read while younger than ttl_seconds; expiring them
+            # at twice that leaves a read started just before the cutoff time to finish
+            target.create_index([(MATERIALIZED_AT_FIELD, 1)], expireAfterSeconds=2 * ttl_seconds)
+        except OperationFailure as e:
+            # An index with a different TTL already exists; freshness is still checked on read
+            logger.warning(f"Could not create TTL index on {target.name}: {e}")
+        
+        self._materialized_collections.add(target.name)
+    
+    def _aggregation_cache_key(self, collection_name: str, pipeline: List[Dict[str, Any]]) -> str:
+        """Hash database, collection and pipeline into an aggregation cache key."""
+        # Key order is kept as-is: it is significant in stages like $sort.
+        # Canonical extended JSON keeps BSON types apart, so an ObjectId and
+        # its hex string, or 1 and 1.0, hash differently
+        encoded = json_util.dumps(
+            [self.database_name, collection_name, pipeline],
+            json_options=CANONICAL_JSON_OPTIONS,
+            default=_tagged_value
+        ).encode('utf-8')
+        return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+    
+    def _get_cached_results(self, cache_key: str) -> Optional[List[Dict[str, Any]]]:
+        """Get cached aggregation results if present and not expired."""
+        with self._result_cache_lock:
+            cached = self._result_cache.get(cache_key)
+            if cached is None:
+                return None
+            
+            cached_at, results = cached
+            if time.monotonic() - cached_at > self.settings.aggregation_cache_ttl:
+                del self._result_cache[cache_key]
+                return None
+            
+            self._result_cache.move_to_end(cache_key)
+            return list(results)
+    
+    def _cache_results(self, cache_key: str, results: List[Dict[str, Any]]) -> None:
+        """Store aggregation results, evicting the least recently used entries."""
+        with self._result_cache_lock:
+            self._result_cache[cache_key] = (time.monotonic(), list(results))
+            self._result_cache.move_to_end(cache_key)
+            while len(self._result_cache) > self.settings.aggregation_cache_size:
+                self._result_cache.popitem(last=False)
+    
+    def clear_result_cache(self) -> None:
+        """Drop all cached aggregation results."""
+        with self._result_cache_lock:
+            self._result_cache.clear()
+    
     def execute_find(self, collection_name: str, query: Dict[str, Any] = None, 
-                    projection: Dict[str, Any] = None, limit: int = None) -> List[Dict[str, Any]]:
+                    projection: Dict[str, Any] = None, limit: int = None,
+                    columns: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
         """
         Execute find query on a collection.
         
@@ -134,18 +419,19 @@ class MongoDBClient:
             query: MongoDB find query
             projection: Fields to include/exclude
             limit: Maximum number of documents to return
+            columns: Fields to project when no explicit projection is given
             
         Returns:
             List of documents from find result
         """
-        if not self.is_connected():
-            raise ConnectionError("Not connected to MongoDB")
+        if projection is None and columns:
+            projection = dict.fromkeys(columns, 1)
         
         try:
             collection = self.get_collection(collection_name)
             logger.info(f"Executing find on {collection_name}")
             
-            cursor = collection.find(query or {}, projection)
+            cursor = collection.find(query or {}, projection, batch_size=DEFAULT_BATCH_SIZE)
             
             if limit:
                 cursor = cursor.limit(limit)
@@ -161,11 +447,9 @@ class MongoDBClient:
     
     def get_collection_stats(self, collection_name: str) -> Dict[str, Any]:
         """Get collection statistics."""
-        if not self.is_connected():
-            raise ConnectionError("Not connected to MongoDB")
+        collection = self.get_collection(collection_name)
         
         try:
-            collection = self.get_collection(collection_name)
             stats = collection.aggregate([{"$collStats": {"count": {}}}]).next()
             return stats
         except Exception as e:
@@ -174,11 +458,9 @@ class MongoDBClient:
     
     def list_collections(self) -> List[str]:
         """List all collections in the database."""
-        if not self.is_connected():
-            raise ConnectionError("Not connected to MongoDB")
+        database = self.get_database()
         
         try:
-            database = self.get_database()
             return database.list_collection_names()
         except Exception as e:
             logger.error(f"Failed to list collections: {e}")
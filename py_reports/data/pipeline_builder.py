@@ -1,31 +1,229 @@
 """MongoDB aggregation pipeline builder with common patterns."""
 
 import logging
-from typing import Dict, Any, List, Optional, Union
+import re
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Set, Union
 from datetime import datetime, date
 
 logger = logging.getLogger(__name__)
 
+# Query operators whose operand is a list of sub-queries
+_LOGICAL_OPERATORS = frozenset({"$and", "$or", "$nor"})
+
+
+@lru_cache(maxsize=1024)
+def _parse_iso(value: str) -> datetime:
+    """Parse an ISO 8601 string, accepting a trailing Z for UTC."""
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    return datetime.fromisoformat(value)
+
+
+def _match_fields(query: Dict[str, Any]) -> Optional[Set[str]]:
+    """Get the top-level fields a $match query reads, or None if unknown."""
+    fields = set()
+    for key, value in query.items():
+        if key in _LOGICAL_OPERATORS:
+            if not isinstance(value, list):
+                return None
+            for sub_query in value:
+                if not isinstance(sub_query, dict):
+                    return None
+                sub_fields = _match_fields(sub_query)
+                if sub_fields is None:
+                    return None
+                fields |= sub_fields
+        elif key.startswith('$'):
+            # $expr, $text, $where etc. may read any field
+            return None
+        else:
+            fields.add(key.split('.')[0])
+    return fields
+
+
+class _NotInlinable(Exception):
+    """Raised when a $group reads something a $project rewrite cannot express."""
+
+
+def _project_renames(projection: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    """Map each field a $project outputs to its source path, or None if it computes values."""
+    # _id passes through unless the projection excludes it
+    renames = {"_id": "$_id"}
+    for field, value in projection.items():
+        if '.' in field or field.startswith('$'):
+            return None
+        if value is True or value == 1:
+            renames[field] = f"${field}"
+        elif field == "_id" and (value is False or value == 0):
+            del renames["_id"]
+        elif isinstance(value, str) and value.startswith('$') and not value.startswith('$$'):
+            renames[field] = value
+        else:
+            return None
+    return renames
+
+
+def _substitute_paths(value: Any, renames: Dict[str, str]) -> Any:
+    """Rewrite field path references in a $group expression through renames."""
+    if isinstance(value, str):
+        if not value.startswith('$'):
+            return value
+        if value.startswith('$$'):
+            # $$ROOT, $$CURRENT and variables see the projected document
+            raise _NotInlinable()
+        top, dot, rest = value[1:].partition('.')
+        if top not in renames:
+            raise _NotInlinable()
+        return renames[top] + dot + rest
+    if isinstance(value, dict):
+        if "$literal" in value:
+            raise _NotInlinable()
+        return {key: _substitute_paths(item, renames) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_substitute_paths(item, renames) for item in value]
+    return value
+
+
+def _inline_project_into_group(projection: Dict[str, Any],
+                               group: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Get the $group with a renaming $project folded in, or None if it cannot be."""
+    renames = _project_renames(projection)
+    if renames is None:
+        return None
+    try:
+        return _substitute_paths(group, renames)
+    except _NotInlinable:
+        return None
+
+
+def _written_fields(stage: Dict[str, Any]) -> Optional[Set[str]]:
+    """Get the top-level fields a $lookup/$unwind stage writes, or None for other stages."""
+    if len(stage) != 1:
+        return None
+    
+    if "$lookup" in stage:
+        as_field = stage["$lookup"].get("as")
+        return {as_field.split('.')[0]} if isinstance(as_field, str) else None
+    
+    if "$unwind" in stage:
+        unwind = stage["$unwind"]
+        if isinstance(unwind, str):
+            unwind = {"path": unwind}
+        path = unwind.get("path")
+        if not isinstance(path, str):
+            return None
+        fields = {path.lstrip('$').split('.')[0]}
+        if unwind.get("includeArrayIndex"):
+            fields.add(unwind["includeArrayIndex"].split('.')[0])
+        return fields
+    
+    return None
+
+
+def _is_indexed_match(query: Dict[str, Any], indexes: Set[str]) -> bool:
+    """Check whether a $match query filters on an indexed field."""
+    for key, value in query.items():
+        if key == "$and" and isinstance(value, list):
+            if any(isinstance(sub_query, dict) and _is_indexed_match(sub_query, indexes)
+                   for sub_query in value):
+                return True
+        elif key in indexes:
+            return True
+    return False
+
+
+def _passable_by_match(stage: Dict[str, Any], fields: Set[str]) -> bool:
+    """Check whether a $match reading fields can run before stage without changing results."""
+    if len(stage) != 1:
+        return False
+    (name, spec), = stage.items()
+    
+    if name in ("$match", "$sort"):
+        return True
+    if name in ("$addFields", "$set"):
+        return isinstance(spec, dict) and fields.isdisjoint(key.split('.')[0] for key in spec)
+    written = _written_fields(stage)
+    return written is not None and not written & fields
+
+
+def _collect_path_references(value: Any, fields: Set[str]) -> bool:
+    """Add the top-level fields of "$path" strings in an expression; False if it reads the whole document."""
+    if isinstance(value, str):
+        if value.startswith('$$'):
+            variable = value[2:].split('.')[0]
+            return variable not in ("ROOT", "CURRENT")
+        if value.startswith('$'):
+            fields.add(value[1:].split('.')[0])
+        return True
+    if isinstance(value, dict):
+        return all(_collect_path_references(item, fields) for item in value.values())
+    if isinstance(value, list):
+        return all(_collect_path_references(item, fields) for item in value)
+    return True
+
+
+def _stage_reads(stage: Dict[str, Any]) -> Optional[Set[str]]:
+    """Get the top-level input fields a stage reads, or None if they cannot be determined."""
+    if len(stage) != 1:
+        return None
+    (name, spec), = stage.items()
+    
+    fields = set()
+    if name == "$match":
+        match_fields = _match_fields(spec)
+        if match_fields is None:
+            return None
+        fields |= match_fields
+    elif name == "$sort":
+        fields.update(key.split('.')[0] for key in spec)
+    elif name in ("$project", "$addFields", "$set"):
+        if name == "$project" and any(
+            key != "_id" and (value is False or value == 0) for key, value in spec.items()
+        ):
+            # Exclusion projections pass through every other field
+            return None
+        # Dotted outputs merge into existing sub-documents
+        fields.update(key.split('.')[0] for key in spec)
+    elif name == "$lookup":
+        if "localField" in spec:
+            fields.add(spec["localField"].split('.')[0])
+    elif name not in ("$unwind", "$group", "$limit", "$skip", "$count"):
+        return None
+    
+    if not _collect_path_references(spec, fields):
+        return None
+    return fields
+
 
 class PipelineBuilder:
     """Builder for MongoDB aggregation pipelines with common patterns."""
     
     def __init__(self):
         self.pipeline = []
+        # Set once build() has handed self.pipeline to a caller
+        self._shared = False
+    
+    def _add(self, *stages: Dict[str, Any]) -> None:
+        """Append stages, copying the pipeline first if build() returned it."""
+        if self._shared:
+            self.pipeline = list(self.pipeline)
+            self._shared = False
+        self.pipeline.extend(stages)
     
     def match(self, query: Dict[str, Any]) -> 'PipelineBuilder':
         """Add $match stage to pipeline."""
-        self.pipeline.append({"$match": query})
+        self._add({"$match": query})
         return self
     
     def project(self, fields: Dict[str, Any]) -> 'PipelineBuilder':
         """Add $project stage to pipeline."""
-        self.pipeline.append({"$project": fields})
+        self._add({"$project": fields})
         return self
     
     def add_fields(self, fields: Dict[str, Any]) -> 'PipelineBuilder':
         """Add $addFields stage to pipeline."""
-        self.pipeline.append({"$addFields": fields})
+        self._add({"$addFields": fields})
         return self
     
     def group(self, group_by: Dict[str, Any], aggregations: Dict[str, Any] = None) -> 'PipelineBuilder':
@@ -33,22 +231,22 @@ class PipelineBuilder:
         group_stage = {"_id": group_by}
         if aggregations:
             group_stage.update(aggregations)
-        self.pipeline.append({"$group": group_stage})
+        self._add({"$group": group_stage})
         return self
     
     def sort(self, sort_fields: Dict[str, int]) -> 'PipelineBuilder':
         """Add $sort stage to pipeline."""
-        self.pipeline.append({"$sort": sort_fields})
+        self._add({"$sort": sort_fields})
         return self
     
     def limit(self, count: int) -> 'PipelineBuilder':
         """Add $limit stage to pipeline."""
-        self.pipeline.append({"$limit": count})
+        self._add({"$limit": count})
         return self
     
     def skip(self, count: int) -> 'PipelineBuilder':
         """Add $skip stage to pipeline."""
-        self.pipeline.append({"$skip": count})
+        self._add({"$skip": count})
         return self
     
     def lookup(self, from_collection: str, local_field: str, foreign_field: str, 
@@ -62,7 +260,7 @@ class PipelineBuilder:
         }
         if pipeline:
             lookup_stage["pipeline"] = pipeline
-        self.pipeline.append({"$lookup": lookup_stage})
+        self._add({"$lookup": lookup_stage})
         return self
     
     def unwind(self, field: str, preserve_null_and_empty_arrays: bool = False) -> 'PipelineBuilder':
@@ -70,12 +268,43 @@ class PipelineBuilder:
         unwind_stage = {"path": field}
         if preserve_null_and_empty_arrays:
             unwind_stage["preserveNullAndEmptyArrays"] = True
-        self.pipeline.append({"$unwind": unwind_stage})
+        self._add({"$unwind": unwind_stage})
+        return self
+    
+    def add_lowercase(self, field: str) -> 'PipelineBuilder':
+        """
+        Add $addFields stage computing a lowercase copy of field as <field>_lc.
+        
+        The copy can be searched with create_text_search_filter_indexed, but
+        as it is computed per query no index can serve it; store and index
+        the lowercase field instead where the schema allows.
+        """
+        self._add({"$addFields": {f"{field}_lc": {"$toLower": f"${field}"}}})
         return self
     
     def facet(self, facets: Dict[str, List[Dict[str, Any]]]) -> 'PipelineBuilder':
-        """Add $facet stage to pipeline."""
-        self.pipeline.append({"$facet": facets})
+        """
+        Add $facet stage to pipeline.
+        
+        Stages every facet starts with are added once before the $facet
+        instead of running in each facet. Each facet keeps at least one
+        stage, and $sample is never shared as it draws different documents
+        per run.
+        """
+        sub_pipelines = list(facets.values())
+        shared = 0
+        if sub_pipelines:
+            first = sub_pipelines[0]
+            while (all(len(sub_pipeline) > shared + 1 for sub_pipeline in sub_pipelines)
+                   and "$sample" not in first[shared]
+                   and all(sub_pipeline[shared] == first[shared] for sub_pipeline in sub_pipelines)):
+                shared += 1
+        
+        if shared:
+            self._add(*sub_pipelines[0][:shared])
+            facets = {name: sub_pipeline[shared:] for name, sub_pipeline in facets.items()}
+        
+        self._add({"$facet": facets})
         return self
     
     def bucket(self, group_by: str, boundaries: List[Any], default: str = "Other",
@@ -88,7 +317,7 @@ class PipelineBuilder:
         }
         if output:
             bucket_stage["output"] = output
-        self.pipeline.append({"$bucket": bucket_stage})
+        self._add({"$bucket": bucket_stage})
         return self
     
     def bucket_auto(self, group_by: str, buckets: int, output: Dict[str, Any] = None,
@@ -102,39 +331,196 @@ class PipelineBuilder:
             bucket_stage["output"] = output
         if granularity:
             bucket_stage["granularity"] = granularity
-        self.pipeline.append({"$bucketAuto": bucket_stage})
+        self._add({"$bucketAuto": bucket_stage})
         return self
     
     def count(self, field: str = "count") -> 'PipelineBuilder':
         """Add $count stage to pipeline."""
-        self.pipeline.append({"$count": field})
+        self._add({"$count": field})
         return self
     
     def sample(self, size: int) -> 'PipelineBuilder':
         """Add $sample stage to pipeline."""
-        self.pipeline.append({"$sample": {"size": size}})
+        self._add({"$sample": {"size": size}})
         return self
     
     def replace_root(self, new_root: Union[str, Dict[str, Any]]) -> 'PipelineBuilder':
         """Add $replaceRoot stage to pipeline."""
         if isinstance(new_root, str):
-            self.pipeline.append({"$replaceRoot": {"newRoot": f"${new_root}"}})
+            self._add({"$replaceRoot": {"newRoot": f"${new_root}"}})
         else:
-            self.pipeline.append({"$replaceRoot": {"newRoot": new_root}})
+            self._add({"$replaceRoot": {"newRoot": new_root}})
         return self
     
     def add_stage(self, stage: Dict[str, Any]) -> 'PipelineBuilder':
         """Add custom stage to pipeline."""
-        self.pipeline.append(stage)
+        self._add(stage)
         return self
     
-    def build(self) -> List[Dict[str, Any]]:
-        """Build and return the pipeline."""
-        return self.pipeline.copy()
+    def build(self, optimize: bool = True) -> List[Dict[str, Any]]:
+        """
+        Build and return the pipeline.
+        
+        The returned list is not copied; adding stages to the builder later
+        leaves it unchanged, but it must not be modified by the caller.
+        
+        Args:
+            optimize: Reorder stages so filters run as early as possible
+        """
+        if optimize:
+            return self.optimize_pipeline(self.pipeline)
+        self._shared = True
+        return self.pipeline
+    
+    @classmethod
+    def optimize_pipeline(cls, stages: List[Dict[str, Any]],
+                          indexes: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Rewrite a pipeline into an equivalent one with fewer or cheaper stages.
+        
+        Filters are moved ahead of joins, adjacent $match stages are merged
+        and a renaming $project feeding a $group is folded into the group.
+        
+        Args:
+            stages: Pipeline to optimize
+            indexes: Indexed fields (leading index keys) of the collection;
+                filters on them are moved to the start of the pipeline so
+                the server can use an index scan
+        """
+        stages = cls._push_down_matches(stages)
+        if indexes:
+            stages = cls._promote_indexed_matches(stages, set(indexes))
+        stages = cls._merge_matches(stages)
+        return cls._collapse_project_group(stages)
+    
+    @classmethod
+    def _push_down_matches(cls, stages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Move each $match above the $lookup/$unwind stages before it.
+        
+        A $match only moves past a stage that does not write any field it
+        reads, so the result is unchanged while fewer documents are joined
+        and unwound.
+        """
+        optimized = []
+        for stage in stages:
+            optimized.append(stage)
+            
+            query = stage.get("$match") if len(stage) == 1 else None
+            if not isinstance(query, dict):
+                continue
+            fields = _match_fields(query)
+            if fields is None:
+                continue
+            
+            index = len(optimized) - 1
+            while index > 0:
+                written = _written_fields(optimized[index - 1])
+                if written is None or written & fields:
+                    break
+                optimized[index - 1], optimized[index] = optimized[index], optimized[index - 1]
+                index -= 1
+        
+        return optimized
+    
+    @classmethod
+    def _promote_indexed_matches(cls, stages: List[Dict[str, Any]],
+                                 indexes: Set[str]) -> List[Dict[str, Any]]:
+        """
+        Move each $match on an indexed field towards the start of the pipeline.
+        
+        Besides joins, such a $match also moves past $sort, other $match
+        stages and $addFields/$set that do not write a field it reads.
+        """
+        promoted = []
+        for stage in stages:
+            promoted.append(stage)
+            
+            query = stage.get("$match") if len(stage) == 1 else None
+            if not isinstance(query, dict) or not _is_indexed_match(query, indexes):
+                continue
+            fields = _match_fields(query)
+            if fields is None:
+                continue
+            
+            index = len(promoted) - 1
+            while index > 0:
+                previous = promoted[index - 1]
+                if not _passable_by_match(previous, fields):
+                    break
+                previous_query = previous.get("$match")
+                if isinstance(previous_query, dict) and _is_indexed_match(previous_query, indexes):
+                    # Keep the order of filters that can both use an index
+                    break
+                promoted[index - 1], promoted[index] = stage, previous
+                index -= 1
+        
+        return promoted
+    
+    @classmethod
+    def _merge_matches(cls, stages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Merge consecutive $match stages into one."""
+        merged = []
+        for stage in stages:
+            previous = merged[-1] if merged else None
+            if (previous is not None and len(stage) == 1 and "$match" in stage
+                    and len(previous) == 1 and "$match" in previous):
+                first, second = previous["$match"], stage["$match"]
+                if first.keys().isdisjoint(second.keys()):
+                    merged[-1] = {"$match": {**first, **second}}
+                else:
+                    merged[-1] = {"$match": {"$and": [first, second]}}
+            else:
+                merged.append(stage)
+        return merged
+    
+    @classmethod
+    def _collapse_project_group(cls, stages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fold a $project that only renames or keeps fields into the $group after it."""
+        collapsed = []
+        index = 0
+        while index < len(stages):
+            stage = stages[index]
+            if index + 1 < len(stages) and len(stage) == 1 and "$project" in stage:
+                next_stage = stages[index + 1]
+                if len(next_stage) == 1 and "$group" in next_stage:
+                    group = _inline_project_into_group(stage["$project"], next_stage["$group"])
+                    if group is not None:
+                        collapsed.append({"$group": group})
+                        index += 2
+                        continue
+            collapsed.append(stage)
+            index += 1
+        return collapsed
+    
+    @classmethod
+    def project_early(cls, stages: List[Dict[str, Any]], fields: List[str]) -> List[Dict[str, Any]]:
+        """
+        Insert a $project after the leading $match stages keeping only needed fields.
+        
+        The projection keeps the given fields plus every field later stages
+        read. When a later stage's inputs cannot be determined (unknown stage,
+        $$ROOT, $text, ...) the pipeline is returned unchanged.
+        """
+        index = 0
+        while index < len(stages) and len(stages[index]) == 1 and "$match" in stages[index]:
+            index += 1
+        
+        needed = {field.split('.')[0] for field in fields}
+        for stage in stages[index:]:
+            reads = _stage_reads(stage)
+            if reads is None:
+                logger.debug(f"Not projecting early, cannot tell which fields {stage} reads")
+                return list(stages)
+            needed |= reads
+        
+        projection = {field: 1 for field in sorted(needed)}
+        return stages[:index] + [{"$project": projection}] + stages[index:]
     
     def reset(self) -> 'PipelineBuilder':
         """Reset pipeline to empty state."""
         self.pipeline = []
+        self._shared = False
         return self
     
     @classmethod
@@ -142,12 +528,12 @@ class PipelineBuilder:
                                 to_date: Union[str, datetime, date]) -> Dict[str, Any]:
         """Create date range filter for MongoDB queries."""
         if isinstance(from_date, str):
-            from_date = datetime.fromisoformat(from_date.replace('Z', '+00:00'))
+            from_date = _parse_iso(from_date)
         elif isinstance(from_date, date) and not isinstance(from_date, datetime):
             from_date = datetime.combine(from_date, datetime.min.time())
         
         if isinstance(to_date, str):
-            to_date = datetime.fromisoformat(to_date.replace('Z', '+00:00'))
+            to_date = _parse_iso(to_date)
         elif isinstance(to_date, date) and not isinstance(to_date, datetime):
             to_date = datetime.combine(to_date, datetime.max.time())
         
@@ -175,18 +561,53 @@ class PipelineBuilder:
             return {id_field: {"$in": ids}}
     
     @classmethod
-    def create_text_search_filter(cls, search_fields: List[str], search_term: str) -> Dict[str, Any]:
-        """Create text search filter for MongoDB queries."""
+    def create_text_search_filter(cls, search_fields: List[str], search_term: str,
+                                  use_text_index: bool = False) -> Dict[str, Any]:
+        """
+        Create text search filter for MongoDB queries.
+        
+        Args:
+            search_fields: Fields to search (ignored with use_text_index)
+            search_term: Text to search for
+            use_text_index: Search with $text; the collection must have a text
+                index, e.g. create_index([(field, "text"), ...]), which also
+                decides the fields searched
+        """
         if not search_term:
             return {}
         
+        if use_text_index:
+            return {"$text": {"$search": search_term}}
+        
+        # Match the term literally; user input must not be run as a regex
+        pattern = re.escape(search_term)
         return {
             "$or": [
-                {field: {"$regex": search_term, "$options": "i"}}
+                {field: {"$regex": pattern, "$options": "i"}}
                 for field in search_fields
             ]
         }
     
+    @classmethod
+    def create_text_search_filter_indexed(cls, search_field: str, search_term: str) -> Dict[str, Any]:
+        """
+        Create a case-insensitive prefix search filter that can use an index.
+        
+        Matches documents whose search_field starts with search_term. The
+        field must hold lowercased text (e.g. names and codes concatenated
+        and lowercased at ingest) and should have a regular index: an
+        anchored, case-sensitive regex is served by an index range scan,
+        unlike the "i" option regexes of create_text_search_filter.
+        
+        Args:
+            search_field: Field holding the lowercased searchable text
+            search_term: Text the field must start with
+        """
+        if not search_term:
+            return {}
+        
+        return {search_field: {"$regex": f"^{re.escape(search_term.lower())}"}}
+    
     @classmethod
     def create_pivot_pipeline(cls, rows: List[str], columns: List[str], 
                              measures: List[Dict[str, Any]], 
@@ -1,14 +1,177 @@
 """Query execution and result processing."""
 
 import logging
-from typing import Dict, Any, List, Optional, Union
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Tuple, Union
 from datetime import datetime, date
 from decimal import Decimal
-from .mongodb_client import MongoDBClient
+from bson import Decimal128, ObjectId
+from ..config.report_config import MaterializeConfig
+from .mongodb_client import DEFAULT_BATCH_SIZE, IndexHint, MongoDBClient
 from .pipeline_builder import PipelineBuilder
 
 logger = logging.getLogger(__name__)
 
+# {{param_name}} markers in pipeline strings
+_PARAMETER_PATTERN = re.compile(r"\{\{(\w+)\}\}")
+
+# Marker sites of recently used pipelines, keyed by pipeline identity
+COMPILED_PIPELINE_CACHE_SIZE = 256
+_compiled_pipelines: "OrderedDict[int, Tuple[List[Dict[str, Any]], Optional[tuple]]]" = OrderedDict()
+_compiled_pipelines_lock = threading.Lock()
+
+# Rough relative cost of pipeline stages, used by estimate_query_cost
+_STAGE_COSTS: Dict[str, float] = {
+    "$match": 0.1,
+    "$lookup": 0.1,
+    "$group": 0.2,
+    "$sort": 0.2,
+    "$project": 0.05,
+    "$addFields": 0.05,
+}
+
+# Seconds collection statistics are reused by estimate_query_cost
+COLLECTION_STATS_TTL = 60
+
+
+# Result value converters by exact type; None keeps the value as-is
+_VALUE_CONVERTERS: Dict[type, Optional[Callable[[Any], Any]]] = {
+    str: None,
+    int: None,
+    float: None,
+    bool: None,
+    type(None): None,
+    list: None,
+    dict: None,
+    ObjectId: str,
+    datetime: datetime.isoformat,
+    Decimal: float,
+    Decimal128: lambda value: float(value.to_decimal()),
+}
+_UNRESOLVED = object()
+
+
+def _resolve_converter(value_type: type) -> Optional[Callable[[Any], Any]]:
+    """Find and remember the converter for a type missing from _VALUE_CONVERTERS."""
+    if issubclass(value_type, ObjectId):
+        convert = str
+    elif issubclass(value_type, datetime):
+        convert = datetime.isoformat
+    elif issubclass(value_type, Decimal):
+        convert = float
+    elif value_type.__module__.startswith('bson'):
+        # Other MongoDB types
+        convert = str
+    else:
+        convert = None
+    _VALUE_CONVERTERS[value_type] = convert
+    return convert
+
+
+def _parameter_value(value: Any) -> Any:
+    """Convert a parameter value to the type it is stored with in MongoDB."""
+    if isinstance(value, date) and not isinstance(value, datetime):
+        # BSON has no date type
+        return datetime.combine(value, datetime.min.time())
+    if isinstance(value, tuple):
+        return list(value)
+    return value
+
+
+def _substitute_text(text: str, values: Dict[str, Any]) -> str:
+    """Replace every known marker in text with its value's string form."""
+    return _PARAMETER_PATTERN.sub(
+        lambda match: str(values[match.group(1)]) if match.group(1) in values else match.group(0),
+        text
+    )
+
+
+def _substitute(node: Any, values: Dict[str, Any]) -> Any:
+    """Return a copy of a pipeline node with parameter markers substituted."""
+    if isinstance(node, str):
+        if '{{' not in node:
+            return node
+        match = _PARAMETER_PATTERN.fullmatch(node)
+        if match is not None:
+            return values.get(match.group(1), node)
+        return _substitute_text(node, values)
+    if isinstance(node, dict):
+        return {
+            _substitute_text(key, values) if '{{' in key else key: _substitute(value, values)
+            for key, value in node.items()
+        }
+    if isinstance(node, list):
+        return [_substitute(item, values) for item in node]
+    return node
+
+
+
+def _find_parameter_sites(node: Any, path: Tuple[Union[str, int], ...],
+                          sites: List[Tuple[Tuple[Union[str, int], ...], str]]) -> bool:
+    """Collect (path, text) of strings holding markers; False if a dict key holds one."""
+    if isinstance(node, str):
+        if '{{' in node:
+            sites.append((path, node))
+    elif isinstance(node, dict):
+        for key, value in node.items():
+            if '{{' in key:
+                return False
+            if not _find_parameter_sites(value, path + (key,), sites):
+                return False
+    elif isinstance(node, list):
+        for index, item in enumerate(node):
+            if not _find_parameter_sites(item, path + (index,), sites):
+                return False
+    return True
+
+
+def _compile_pipeline(pipeline: List[Dict[str, Any]]) -> Optional[tuple]:
+    """
+    Get the marker sites of a pipeline, located once per pipeline object.
+    
+    Pipelines come from cached report configs and are never modified, so they
+    are keyed by identity; each entry keeps its pipeline alive so the id
+    cannot be reused. None means markers in dict keys need the full walk.
+    """
+    key = id(pipeline)
+    with _compiled_pipelines_lock:
+        entry = _compiled_pipelines.get(key)
+        if entry is not None and entry[0] is pipeline:
+            _compiled_pipelines.move_to_end(key)
+            return entry[1]
+    
+    sites = []
+    compiled = tuple(sites) if _find_parameter_sites(pipeline, (), sites) else None
+    
+    with _compiled_pipelines_lock:
+        _compiled_pipelines[key] = (pipeline, compiled)
+        _compiled_pipelines.move_to_end(key)
+        while len(_compiled_pipelines) > COMPILED_PIPELINE_CACHE_SIZE:
+            _compiled_pipelines.popitem(last=False)
+    return compiled
+
+
+def _patch_parameter_sites(pipeline: List[Dict[str, Any]], sites: tuple,
+                           values: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Substitute markers at known sites, copying only the containers on their paths."""
+    root = list(pipeline)
+    copies = {(): root}
+    for path, text in sites:
+        node = root
+        for depth in range(len(path) - 1):
+            prefix = path[:depth + 1]
+            container = copies.get(prefix)
+            if container is None:
+                child = node[path[depth]]
+                container = list(child) if isinstance(child, list) else dict(child)
+                node[path[depth]] = container
+                copies[prefix] = container
+            node = container
+        node[path[-1]] = _substitute(text, values)
+    return root
 
 class QueryExecutor:
     """Executes MongoDB queries and processes results."""
@@ -16,9 +179,15 @@ class QueryExecutor:
     def __init__(self, mongodb_client: MongoDBClient):
         self.mongodb_client = mongodb_client
         self.pipeline_builder = PipelineBuilder()
+        self._collection_stats: Dict[str, Tuple[float, Dict[str, Any]]] = {}
     
     def execute_report_query(self, collection_name: str, pipeline: List[Dict[str, Any]], 
-                           parameters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+                           parameters: Dict[str, Any] = None,
+                           materialize: Optional[MaterializeConfig] = None,
+                           required_fields: Optional[List[str]] = None,
+                           hint: Optional[IndexHint] = None,
+                           indexes: Optional[List[str]] = None,
+                           batch_size: int = DEFAULT_BATCH_SIZE) -> List[Dict[str, Any]]:
         """
         Execute a report query with parameter substitution.
         
@@ -26,25 +195,134 @@ class QueryExecutor:
             collection_name: MongoDB collection name
             pipeline: Aggregation pipeline
             parameters: Query parameters for substitution
+            materialize: Serve results from this materialized collection
+            required_fields: Fields the report reads; others are projected away early
+            hint: Index the server should use for the pipeline
+            indexes: Indexed fields of the collection; filters on them run first
+            batch_size: Documents fetched per cursor round-trip; the driver holds a
+                whole batch in memory, so lower it for very large documents
             
         Returns:
             Processed query results
         """
         try:
-            # Substitute parameters in pipeline
+            processed_results = list(
+                self.execute_report_query_iter(
+                    collection_name, pipeline, parameters, materialize, required_fields,
+                    hint, indexes, batch_size
+                )
+            )
+            
+            logger.info(f"Query executed successfully, returned {len(processed_results)} records")
+            return processed_results
+            
+        except Exception as e:
+            logger.error(f"Failed to execute report query: {e}")
+            raise
+    
+    def execute_report_query_iter(self, collection_name: str, pipeline: List[Dict[str, Any]],
+                                  parameters: Dict[str, Any] = None,
+                                  materialize: Optional[MaterializeConfig] = None,
+                                  required_fields: Optional[List[str]] = None,
+                                  hint: Optional[IndexHint] = None,
+                                  indexes: Optional[List[str]] = None,
+                                  batch_size: int = DEFAULT_BATCH_SIZE
+                                  ) -> Iterator[Dict[str, Any]]:
+        """
+        Execute a report query, yielding processed documents as they arrive.
+        
+        Takes the same arguments as execute_report_query. Query errors are
+        raised while iterating.
+        """
+        # Substitute parameters in pipeline
+        processed_pipeline = self._substitute_parameters(pipeline, parameters or {})
+        
+        if required_fields:
+            processed_pipeline = PipelineBuilder.project_early(processed_pipeline, required_fields)
+        if required_fields or indexes:
+            processed_pipeline = PipelineBuilder.optimize_pipeline(processed_pipeline, indexes)
+        
+        if materialize is not None:
+            results = self.mongodb_client.execute_materialized_aggregation(
+                collection_name, processed_pipeline,
+                materialize.collection, materialize.ttl_seconds,
+                hint=hint, batch_size=batch_size
+            )
+        else:
+            # Execute aggregation, processing documents as they stream in
+            results = self.mongodb_client.iter_aggregation(
+                collection_name, processed_pipeline, batch_size=batch_size, hint=hint
+            )
+        
+        return self._iter_processed(results)
+    
+    def execute_count_query(self, collection_name: str, pipeline: List[Dict[str, Any]],
+                            parameters: Dict[str, Any] = None,
+                            hint: Optional[IndexHint] = None) -> int:
+        """
+        Count the documents a report query returns without fetching them.
+        
+        Args:
+            collection_name: MongoDB collection name
+            pipeline: Aggregation pipeline
+            parameters: Query parameters for substitution
+            hint: Index the server should use for the pipeline
+            
+        Returns:
+            Number of documents the pipeline outputs
+        """
+        try:
             processed_pipeline = self._substitute_parameters(pipeline, parameters or {})
+            results = self.mongodb_client.execute_aggregation(
+                collection_name, processed_pipeline + [{"$count": "count"}], hint=hint
+            )
             
-            # Execute aggregation
-            results = self.mongodb_client.execute_aggregation(collection_name, processed_pipeline)
+            # $count outputs no document at all for an empty result
+            count = results[0]["count"] if results else 0
+            logger.info(f"Count query executed successfully, counted {count} records")
+            return count
             
-            # Process results
-            processed_results = self._process_results(results)
+        except Exception as e:
+            logger.error(f"Failed to execute count query: {e}")
+            raise
+    
+    def execute_faceted_queries(self, collection_name: str,
+                                queries: List[Tuple[List[Dict[str, Any]], Dict[str, Any]]]
+                                ) -> List[List[Dict[str, Any]]]:
+        """
+        Execute several pipelines on one collection in a single round-trip.
+        
+        Each pipeline gets its own parameters substituted and runs as one
+        branch of a $facet stage.
+        
+        Args:
+            collection_name: MongoDB collection name
+            queries: (pipeline, parameters) pairs
             
-            logger.info(f"Query executed successfully, returned {len(processed_results)} records")
+        Returns:
+            Processed results of each pipeline, in the order of queries
+        """
+        try:
+            facets = {
+                f"q{index}": self._substitute_parameters(pipeline, parameters or {})
+                for index, (pipeline, parameters) in enumerate(queries)
+            }
+            
+            results = self.mongodb_client.execute_aggregation(
+                collection_name, [{"$facet": facets}]
+            )
+            facet_results = results[0] if results else {}
+            
+            processed_results = [
+                self._process_results(facet_results.get(f"q{index}", []))
+                for index in range(len(queries))
+            ]
+            
+            logger.info(f"Faceted query executed successfully, ran {len(queries)} pipelines")
             return processed_results
             
         except Exception as e:
-            logger.error(f"Failed to execute report query: {e}")
+            logger.error(f"Failed to execute faceted query: {e}")
             raise
     
     def execute_simple_query(self, collection_name: str, query: Dict[str, Any] = None,
@@ -73,72 +351,43 @@ class QueryExecutor:
             raise
     
     def _substitute_parameters(self, pipeline: List[Dict[str, Any]], parameters: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Substitute parameters in pipeline stages."""
-        import json
-        import re
-        
-        # Convert pipeline to JSON string for parameter substitution
-        pipeline_str = json.dumps(pipeline)
+        """
+        Substitute {{param_name}} markers in pipeline stages.
         
-        # Replace parameters in the format {{param_name}}
-        for param_name, param_value in parameters.items():
-            # Handle different parameter types
-            if isinstance(param_value, (str, int, float, bool)):
-                # Direct substitution
-                pattern = f"{{{{{param_name}}}}}"
-                pipeline_str = pipeline_str.replace(pattern, str(param_value))
-            elif isinstance(param_value, (list, tuple)):
-                # Convert list to MongoDB array format
-                pattern = f'"{{{{{param_name}}}}}"'
-                replacement = json.dumps(list(param_value))
-                pipeline_str = pipeline_str.replace(pattern, replacement)
-            elif isinstance(param_value, dict):
-                # Convert dict to MongoDB object format
-                pattern = f'"{{{{{param_name}}}}}"'
-                replacement = json.dumps(param_value)
-                pipeline_str = pipeline_str.replace(pattern, replacement)
-            elif isinstance(param_value, (datetime, date)):
-                # Convert datetime to MongoDB ISODate format
-                pattern = f'"{{{{{param_name}}}}}"'
-                if isinstance(param_value, date) and not isinstance(param_value, datetime):
-                    param_value = datetime.combine(param_value, datetime.min.time())
-                replacement = f'{{"$date": "{param_value.isoformat()}Z"}}'
-                pipeline_str = pipeline_str.replace(pattern, replacement)
+        A string that is exactly one marker is replaced by the parameter value
+        itself, so numbers, lists and dates keep their type; markers embedded
+        in longer strings are replaced by the value's text. Markers of
+        parameters that were not given are left as they are.
+        """
+        values = {
+            name: _parameter_value(value)
+            for name, value in parameters.items()
+            if value is not None
+        }
         
-        # Parse back to Python objects
-        try:
-            return json.loads(pipeline_str)
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse pipeline after parameter substitution: {e}")
-            logger.error(f"Pipeline string: {pipeline_str}")
-            raise ValueError(f"Invalid pipeline after parameter substitution: {e}")
+        sites = _compile_pipeline(pipeline)
+        if sites is None:
+            return _substitute(pipeline, values)
+        return _patch_parameter_sites(pipeline, sites, values)
     
-    def _process_results(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _process_results(self, results: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Process query results for consistency."""
-        processed = []
-        
+        return list(self._iter_processed(results))
+    
+    def _iter_processed(self, results: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield query results converted to plain Python types, one at a time."""
+        converters = _VALUE_CONVERTERS
         for doc in results:
             processed_doc = {}
             
             for key, value in doc.items():
-                # Handle MongoDB ObjectId
-                if hasattr(value, '__class__') and value.__class__.__name__ == 'ObjectId':
-                    processed_doc[key] = str(value)
-                # Handle datetime objects
-                elif isinstance(value, datetime):
-                    processed_doc[key] = value.isoformat()
-                # Handle Decimal objects
-                elif isinstance(value, Decimal):
-                    processed_doc[key] = float(value)
-                # Handle other MongoDB types
-                elif hasattr(value, '__class__') and 'bson' in str(value.__class__.__module__):
-                    processed_doc[key] = str(value)
-                else:
-                    processed_doc[key] = value
+                value_type = type(value)
+                convert = converters.get(value_type, _UNRESOLVED)
+                if convert is _UNRESOLVED:
+                    convert = _resolve_converter(value_type)
+                processed_doc[key] = value if convert is None else convert(value)
             
-            processed.append(processed_doc)
-        
-        return processed
+            yield processed_doc
     
     def validate_parameters(self, parameters: Dict[str, Any], 
                           parameter_definitions: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
@@ -222,7 +471,7 @@ class QueryExecutor:
         """Estimate query execution cost and performance."""
         try:
             # Get collection stats
-            stats = self.mongodb_client.get_collection_stats(collection_name)
+            stats = self._get_collection_stats(collection_name)
             
             # Get query plan
             plan = self.get_query_plan(collection_name, pipeline)
@@ -231,16 +480,9 @@ class QueryExecutor:
             estimated_docs = stats.get('count', 0)
             estimated_time = 0
             
+            # Rough estimation based on stage type
             for stage in pipeline:
-                stage_name = list(stage.keys())[0] if stage else 'unknown'
-                
-                # Rough estimation based on stage type
-                if stage_name in ['$match', '$lookup']:
-                    estimated_time += 0.1
-                elif stage_name in ['$group', '$sort']:
-                    estimated_time += 0.2
-                elif stage_name in ['$project', '$addFields']:
-                    estimated_time += 0.05
+                estimated_time += _STAGE_COSTS.get(next(iter(stage), ''), 0)
             
             return {
                 'estimated_documents': estimated_docs,
@@ -252,4 +494,16 @@ class QueryExecutor:
             
         except Exception as e:
             logger.warning(f"Failed to estimate query cost: {e}")
-            return {'error': str(e)}
\ No newline at end of file
+            return {'error': str(e)}
+    
+    def _get_collection_stats(self, collection_name: str) -> Dict[str, Any]:
+        """Get collection statistics, reusing them for COLLECTION_STATS_TTL seconds."""
+        cached = self._collection_stats.get(collection_name)
+        if cached is not None and time.monotonic() - cached[0] <= COLLECTION_STATS_TTL:
+            return cached[1]
+        
+        stats = self.mongodb_client.get_collection_stats(collection_name)
+        if stats:
+            # Failed lookups return {} and are retried next time
+            self._collection_stats[collection_name] = (time.monotonic(), stats)
+        return stats
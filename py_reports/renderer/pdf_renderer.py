@@ -1,21 +1,56 @@
 """PDF renderer using WeasyPrint with header/footer support."""
 
+import copy
+import hashlib
 import logging
-from typing import Dict, Any, Optional, Union
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, BinaryIO, Callable, Dict, Any, List, Optional, Tuple, Union
 from pathlib import Path
 from io import BytesIO
-import weasyprint
-from weasyprint import HTML, CSS
-from weasyprint.text.fonts import FontConfiguration
 from ..templates import get_template_engine
 from ..config.settings import get_settings
 
+if TYPE_CHECKING:
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+
 logger = logging.getLogger(__name__)
 
+# WeasyPrint module, imported on first use
+_weasyprint = None
+
+
+def _wp():
+    """Import WeasyPrint on first use, as loading Pango and Cairo is slow."""
+    global _weasyprint
+    if _weasyprint is None:
+        import weasyprint
+        import weasyprint.text.fonts
+        _weasyprint = weasyprint
+    return _weasyprint
+
+# Maximum number of parsed stylesheets kept across renders
+CSS_CACHE_SIZE = 64
+
+# Maximum number of HTML validation results kept
+VALIDATION_CACHE_SIZE = 256
+
 
 class PDFRenderer:
     """PDF renderer with WeasyPrint backend."""
     
+    # Parsed stylesheets shared by all renderers, keyed by source; each entry
+    # keeps the font configuration it was parsed with
+    _css_cache: "OrderedDict[tuple, Tuple[FontConfiguration, CSS]]" = OrderedDict()
+    _css_cache_lock = threading.Lock()
+    
+    # validate_html results keyed by base URL and content digest
+    _validation_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+    _validation_cache_lock = threading.Lock()
+    
     def __init__(self, templates_dir: str = "py_reports/templates", locale: str = "en_US"):
         self.templates_dir = Path(templates_dir)
         self.locale = locale
@@ -23,130 +58,97 @@ class PDFRenderer:
         self.template_engine = get_template_engine(templates_dir, locale)
         
         # Font configuration for Unicode support
-        self.font_config = FontConfiguration()
+        self.font_config = _wp().text.fonts.FontConfiguration()
         
-        # CSS files to include
+        # CSS files to include, parsed once up front
         self.css_files = [
             self.templates_dir / "base.css"
         ]
+        self._css_docs: List["CSS"] = []
+        self._resolve_css_files()
     
     def render_pdf(self, template_name: str, context: Dict[str, Any], 
-                   output_path: Optional[Union[str, Path]] = None) -> Union[bytes, Path]:
+                   output_path: Optional[Union[str, Path, BinaryIO]] = None) -> Union[bytes, Path, BinaryIO]:
         """
         Render PDF from template and context.
         
         Args:
             template_name: Name of the template file
             context: Template context variables
-            output_path: Output file path (if None, returns bytes)
+            output_path: Output file path or writable binary file object
+                (if None, returns bytes)
             
         Returns:
-            PDF bytes or output file path
+            PDF bytes, output file path or the file object written to
         """
         try:
             # Render HTML from template
             html_content = self.template_engine.render_template(template_name, context)
             
-            # Create HTML object
-            html_doc = HTML(string=html_content, base_url=str(self.templates_dir))
-            
-            # Load CSS files
-            css_docs = []
-            for css_file in self.css_files:
-                if css_file.exists():
-                    css_docs.append(CSS(filename=str(css_file), font_config=self.font_config))
-            
-            # Add custom CSS if specified in context
-            if 'config' in context and context['config'].get('css_file'):
-                custom_css_path = self.templates_dir / context['config']['css_file']
-                if custom_css_path.exists():
-                    css_docs.append(CSS(filename=str(custom_css_path), font_config=self.font_config))
-            
-            # Add page CSS for pagination if available
-            if 'page_css' in context:
-                page_css_content = context['page_css']
-                if page_css_content:
-                    css_docs.append(CSS(string=page_css_content, font_config=self.font_config))
-            
-            # Render PDF
-            pdf_doc = html_doc.render(stylesheets=css_docs, font_config=self.font_config)
-            
-            if output_path:
-                # Save to file
-                output_path = Path(output_path)
-                output_path.parent.mkdir(parents=True, exist_ok=True)
-                pdf_doc.write_pdf(str(output_path))
-                logger.info(f"PDF saved to: {output_path}")
-                return output_path
-            else:
-                # Return bytes
-                pdf_bytes = pdf_doc.write_pdf()
-                logger.info(f"PDF generated, size: {len(pdf_bytes)} bytes")
-                return pdf_bytes
+            return self._render_html(html_content, context, output_path)
                 
         except Exception as e:
             logger.error(f"Failed to render PDF: {e}")
             raise
     
     def render_pdf_from_string(self, html_content: str, context: Dict[str, Any],
-                              output_path: Optional[Union[str, Path]] = None) -> Union[bytes, Path]:
+                              output_path: Optional[Union[str, Path, BinaryIO]] = None) -> Union[bytes, Path, BinaryIO]:
         """
         Render PDF from HTML string.
         
         Args:
             html_content: HTML content string
             context: Template context variables
-            output_path: Output file path (if None, returns bytes)
+            output_path: Output file path or writable binary file object
+                (if None, returns bytes)
             
         Returns:
-            PDF bytes or output file path
+            PDF bytes, output file path or the file object written to
         """
         try:
-            # Create HTML object
-            html_doc = HTML(string=html_content, base_url=str(self.templates_dir))
-            
-            # Load CSS files
-            css_docs = []
-            for css_file in self.css_files:
-                if css_file.exists():
-                    css_docs.append(CSS(filename=str(css_file), font_config=self.font_config))
-            
-            # Add custom CSS if specified in context
-            if 'config' in context and context['config'].get('css_file'):
-                custom_css_path = self.templates_dir / context['config']['css_file']
-                if custom_css_path.exists():
-                    css_docs.append(CSS(filename=str(custom_css_path), font_config=self.font_config))
-            
-            # Add page CSS for pagination if available
-            if 'page_css' in context:
-                page_css_content = context['page_css']
-                if page_css_content:
-                    css_docs.append(CSS(string=page_css_content, font_config=self.font_config))
-            
-            # Render PDF
-            pdf_doc = html_doc.render(stylesheets=css_docs, font_config=self.font_config)
-            
-            if output_path:
-                # Save to file
-                output_path = Path(output_path)
-                output_path.parent.mkdir(parents=True, exist_ok=True)
-                pdf_doc.write_pdf(str(output_path))
-                logger.info(f"PDF saved to: {output_path}")
-                return output_path
-            else:
-                # Return bytes
-                pdf_bytes = pdf_doc.write_pdf()
-                logger.info(f"PDF generated, size: {len(pdf_bytes)} bytes")
-                return pdf_bytes
+            return self._render_html(html_content, context, output_path)
                 
         except Exception as e:
             logger.error(f"Failed to render PDF from string: {e}")
             raise
     
+    def render_many(self, jobs: List[Tuple[str, Dict[str, Any], Optional[Union[str, Path, BinaryIO]]]],
+                    max_workers: Optional[int] = None) -> List[Union[bytes, Path, BinaryIO]]:
+        """
+        Render several templates concurrently.
+        
+        Each worker thread renders with its own FontConfiguration, as
+        WeasyPrint font configurations are not safe to share between threads.
+        
+        Args:
+            jobs: (template_name, context, output_path) tuples, as for render_pdf
+            max_workers: Worker threads (defaults to the number of CPUs)
+            
+        Returns:
+            render_pdf results, in the order of jobs
+        """
+        if len(jobs) < 2:
+            return [self.render_pdf(*job) for job in jobs]
+        
+        worker_state = threading.local()
+        
+        def render(job):
+            renderer = getattr(worker_state, 'renderer', None)
+            if renderer is None:
+                renderer = copy.copy(self)
+                renderer.font_config = _wp().text.fonts.FontConfiguration()
+                renderer._resolve_css_files()
+                worker_state.renderer = renderer
+            return renderer.render_pdf(*job)
+        
+        workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(render, jobs))
+    
     def render_report(self, report_data: Dict[str, Any], 
                      report_config: Dict[str, Any],
                      parameters: Dict[str, Any] = None,
-                     output_path: Optional[Union[str, Path]] = None) -> Union[bytes, Path]:
+                     output_path: Optional[Union[str, Path, BinaryIO]] = None) -> Union[bytes, Path, BinaryIO]:
         """
         Render complete report to PDF.
         
@@ -154,10 +156,11 @@ class PDFRenderer:
             report_data: Processed report data
             report_config: Report configuration
             parameters: Report parameters
-            output_path: Output file path (if None, returns bytes)
+            output_path: Output file path or writable binary file object
+                (if None, returns bytes)
             
         Returns:
-            PDF bytes or output file path
+            PDF bytes, output file path or the file object written to
         """
         try:
             # Create template context
@@ -175,12 +178,103 @@ class PDFRenderer:
             logger.error(f"Failed to render report: {e}")
             raise
     
+    def _render_html(self, html_content: str, context: Dict[str, Any],
+                     output_path: Optional[Union[str, Path, BinaryIO]]) -> Union[bytes, Path, BinaryIO]:
+        """Render HTML with the stylesheets for context and write the PDF."""
+        html_doc = _wp().HTML(string=html_content, base_url=str(self.templates_dir))
+        pdf_doc = html_doc.render(stylesheets=self._build_stylesheets(context), font_config=self.font_config)
+        return self._write_pdf(pdf_doc, output_path)
+    
+    def _build_stylesheets(self, context: Dict[str, Any]) -> List["CSS"]:
+        """Collect base, custom and page stylesheets for a render."""
+        css_docs = list(self._css_docs)
+        
+        # Add custom CSS if specified in context
+        if 'config' in context and context['config'].get('css_file'):
+            custom_css_path = self.templates_dir / context['config']['css_file']
+            css_doc = self._load_css(custom_css_path)
+            if css_doc is not None:
+                css_docs.append(css_doc)
+        
+        # Add page CSS for pagination if available
+        page_css_content = context.get('page_css')
+        if page_css_content:
+            css_docs.append(self._load_css_string(page_css_content))
+        
+        return css_docs
+    
+    def _resolve_css_files(self) -> None:
+        """Parse the configured CSS files with the current font configuration."""
+        css_docs = []
+        for css_file in self.css_files:
+            css_doc = self._load_css(css_file)
+            if css_doc is not None:
+                css_docs.append(css_doc)
+        self._css_docs = css_docs
+    
+    def _load_css(self, css_path: Path) -> Optional["CSS"]:
+        """Get the parsed stylesheet of a CSS file, or None if it does not exist."""
+        try:
+            mtime_ns = css_path.stat().st_mtime_ns
+        except OSError:
+            return None
+        
+        return self._get_cached_css(
+            ('file', str(css_path), mtime_ns),
+            lambda: _wp().CSS(filename=str(css_path), font_config=self.font_config)
+        )
+    
+    def _load_css_string(self, css_content: str) -> "CSS":
+        """Get the parsed stylesheet of inline CSS."""
+        digest = hashlib.blake2b(css_content.encode('utf-8'), digest_size=16).hexdigest()
+        return self._get_cached_css(
+            ('string', digest),
+            lambda: _wp().CSS(string=css_content, font_config=self.font_config)
+        )
+    
+    def _get_cached_css(self, key: tuple, parse: Callable[[], "CSS"]) -> "CSS":
+        """Reuse a stylesheet parsed with this renderer's font configuration, or parse it."""
+        key += (id(self.font_config),)
+        with self._css_cache_lock:
+            cached = self._css_cache.get(key)
+            if cached is not None and cached[0] is self.font_config:
+                self._css_cache.move_to_end(key)
+                return cached[1]
+        
+        css_doc = parse()
+        
+        with self._css_cache_lock:
+            self._css_cache[key] = (self.font_config, css_doc)
+            self._css_cache.move_to_end(key)
+            while len(self._css_cache) > CSS_CACHE_SIZE:
+                self._css_cache.popitem(last=False)
+        return css_doc
+    
+    def _write_pdf(self, pdf_doc, output_path: Optional[Union[str, Path, BinaryIO]]
+                   ) -> Union[bytes, Path, BinaryIO]:
+        """Write a rendered document to a file path or file object, or return its bytes."""
+        if hasattr(output_path, 'write'):
+            # Stream into the caller's file object
+            pdf_doc.write_pdf(output_path)
+            logger.info("PDF written to file object")
+            return output_path
+        
+        if not output_path:
+            # Return bytes
+            pdf_bytes = pdf_doc.write_pdf()
+            logger.info(f"PDF generated, size: {len(pdf_bytes)} bytes")
+            return pdf_bytes
+        
+        # Save to file
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        pdf_doc.write_pdf(str(output_path))
+        logger.info(f"PDF saved to: {output_path}")
+        return output_path
+    
     def get_pdf_info(self, pdf_bytes: bytes) -> Dict[str, Any]:
         """Get information about PDF content."""
         try:
-            from weasyprint import HTML
-            from io import BytesIO
-            
             # This is a simplified version - in practice, you'd need to parse the PDF
             return {
                 'size_bytes': len(pdf_bytes),
@@ -193,37 +287,57 @@ class PDFRenderer:
             return {'error': str(e)}
     
     def validate_html(self, html_content: str) -> Dict[str, Any]:
-        """Validate HTML content before rendering."""
+        """
+        Validate HTML content before rendering.
+        
+        The HTML is only parsed, not laid out, so validation stays cheap;
+        results are cached by content.
+        """
+        digest = hashlib.blake2b(html_content.encode('utf-8'), digest_size=16).digest()
+        key = (str(self.templates_dir), digest)
+        with self._validation_cache_lock:
+            cached = self._validation_cache.get(key)
+            if cached is not None:
+                self._validation_cache.move_to_end(key)
+                return dict(cached)
+        
         try:
-            # Try to create HTML object
-            html_doc = HTML(string=html_content, base_url=str(self.templates_dir))
-            
-            # Try to render (this will catch most errors)
-            pdf_doc = html_doc.render(font_config=self.font_config)
+            # Creating the HTML object parses the document
+            _wp().HTML(string=html_content, base_url=str(self.templates_dir))
             
-            return {
+            result = {
                 'valid': True,
                 'message': 'HTML is valid'
             }
         except Exception as e:
-            return {
+            result = {
                 'valid': False,
                 'error': str(e),
                 'message': f'HTML validation failed: {e}'
             }
+        
+        with self._validation_cache_lock:
+            self._validation_cache[key] = result
+            self._validation_cache.move_to_end(key)
+            while len(self._validation_cache) > VALIDATION_CACHE_SIZE:
+                self._validation_cache.popitem(last=False)
+        return dict(result)
     
     def add_css_file(self, css_path: Union[str, Path]):
         """Add CSS file to rendering process."""
         css_path = Path(css_path)
-        if css_path.exists():
+        css_doc = self._load_css(css_path)
+        if css_doc is not None:
             self.css_files.append(css_path)
+            self._css_docs.append(css_doc)
             logger.info(f"Added CSS file: {css_path}")
         else:
             logger.warning(f"CSS file not found: {css_path}")
     
-    def set_font_config(self, font_config: FontConfiguration):
+    def set_font_config(self, font_config: "FontConfiguration"):
         """Set custom font configuration."""
         self.font_config = font_config
+        self._resolve_css_files()
         logger.info("Font configuration updated")
     
     def get_supported_fonts(self) -> list:
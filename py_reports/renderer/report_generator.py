@@ -1,44 +1,120 @@
 """Main report generator that orchestrates the entire process."""
 
 import logging
-from typing import Dict, Any, Optional, Union
+import threading
+from functools import cached_property, lru_cache
+from typing import BinaryIO, Callable, Dict, Any, Optional, Tuple, Union
 from pathlib import Path
 from datetime import datetime
-from ..config import get_settings, ReportConfig, load_report_config
-from ..data import get_mongodb_client, QueryExecutor
+from ..config import get_settings, ReportConfig, load_report_config, clear_report_config_cache
+from ..data import get_mongodb_client, MongoDBClient, QueryExecutor
 from ..transforms import TableTransformer, PivotTransformer, SubreportProcessor
-from ..templates import get_template_engine
-from .pdf_renderer import get_pdf_renderer
+from ..templates import get_template_engine, TemplateEngine
+from .pdf_renderer import get_pdf_renderer, PDFRenderer
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=256)
+def _compile_filter(filter_str: str) -> Callable[[dict], bool]:
+    """
+    Parse a summary filter into a row predicate.
+    
+    Filters have the form "field:condition", where field may be a dotted
+    path and condition is "!=" (value present), "=value", "!=value" or a
+    bare value to compare with; a filter without ":" matches every row.
+    """
+    if ":" not in filter_str:
+        return lambda row: True
+    
+    field, condition = filter_str.split(":", 1)
+    parts = tuple(field.split("."))
+    
+    if len(parts) == 1:
+        def get_value(row):
+            return row.get(field)
+    else:
+        def get_value(row):
+            value = row
+            for part in parts:
+                if isinstance(value, dict) and part in value:
+                    value = value[part]
+                else:
+                    return None
+            return value
+    
+    if condition == "!=":
+        def predicate(row):
+            value = get_value(row)
+            return value is not None and value != ""
+        return predicate
+    
+    if condition.startswith("="):
+        expected = condition[1:]
+        return lambda row: str(get_value(row)) == expected
+    if condition.startswith("!="):
+        excluded = condition[2:]
+        return lambda row: str(get_value(row)) != excluded
+    return lambda row: str(get_value(row)) == condition
+
+
 class ReportGenerator:
     """Main report generator that orchestrates the entire process."""
     
+    # Latest validation result of each template, keyed by templates directory
+    # and template name, with the modification time it was computed for
+    _template_validation_cache: Dict[Tuple[str, str], Tuple[int, Dict[str, Any]]] = {}
+    _template_validation_cache_lock = threading.Lock()
+    
     def __init__(self, locale: str = "en_US"):
         self.locale = locale
         self.settings = get_settings()
-        self.mongodb_client = get_mongodb_client()
-        self.query_executor = QueryExecutor(self.mongodb_client)
-        self.table_transformer = TableTransformer(locale)
-        self.pivot_transformer = PivotTransformer(locale)
-        self.subreport_processor = SubreportProcessor(self.query_executor)
-        self.template_engine = get_template_engine(locale=locale)
-        self.pdf_renderer = get_pdf_renderer(locale=locale)
+    
+    # Components are built on first use, so listing and describing reports
+    # does not pay for the database client, templates or PDF renderer
+    
+    @cached_property
+    def mongodb_client(self) -> MongoDBClient:
+        return get_mongodb_client()
+    
+    @cached_property
+    def query_executor(self) -> QueryExecutor:
+        return QueryExecutor(self.mongodb_client)
+    
+    @cached_property
+    def table_transformer(self) -> TableTransformer:
+        return TableTransformer(self.locale)
+    
+    @cached_property
+    def pivot_transformer(self) -> PivotTransformer:
+        return PivotTransformer(self.locale)
+    
+    @cached_property
+    def subreport_processor(self) -> SubreportProcessor:
+        return SubreportProcessor(self.query_executor)
+    
+    @cached_property
+    def template_engine(self) -> TemplateEngine:
+        return get_template_engine(locale=self.locale)
+    
+    @cached_property
+    def pdf_renderer(self) -> PDFRenderer:
+        return get_pdf_renderer(locale=self.locale)
     
     def generate_report(self, report_name: str, parameters: Dict[str, Any] = None,
-                       output_path: Optional[Union[str, Path]] = None) -> Union[bytes, Path]:
+                       output_path: Optional[Union[str, Path, BinaryIO]] = None
+                       ) -> Union[bytes, Path, BinaryIO]:
         """
         Generate a complete report.
         
         Args:
             report_name: Name of the report configuration
             parameters: Report parameters
-            output_path: Output file path (if None, returns bytes)
+            output_path: Output file path or writable binary file object
+                (if None, returns bytes)
             
         Returns:
-            PDF bytes or output file path
+            PDF bytes, output file path or the file object written to
         """
         try:
             logger.info(f"Starting report generation: {report_name}")
@@ -52,55 +128,85 @@ class ReportGenerator:
                 parameters or {}, report_config.parameters
             )
             
-            # Connect to MongoDB
+            # Connect to MongoDB (reuses the pooled connection when already open)
             if not self.mongodb_client.connect():
                 raise ConnectionError("Failed to connect to MongoDB")
             
-            try:
-                # Execute main report query
-                main_data = self.query_executor.execute_report_query(
-                    report_config.collection,
-                    report_config.pipeline,
-                    validated_params
+            # Subreports do not depend on the main data, so parallel subreports
+            # also run alongside the main query
+            if (report_config.parallel_subreports and not report_config.faceted_subreports
+                    and report_config.subreports):
+                subreport_futures = self.subreport_processor.submit_subreports(
+                    report_config.subreports,
+                    self._create_parent_context(validated_params),
+                    report_config.collection
                 )
-                
-                # Process main data
-                processed_data = self._process_main_data(main_data, report_config)
-                
-                # Process subreports
+                try:
+                    processed_data = self._fetch_main_data(report_config, validated_params)
+                except BaseException:
+                    self.subreport_processor.cancel_subreports(subreport_futures)
+                    raise
+                subreports = self.subreport_processor.collect_subreports(subreport_futures)
+            else:
+                processed_data = self._fetch_main_data(report_config, validated_params)
                 subreports = self._process_subreports(report_config, validated_params)
-                
-                # Create report data structure
-                report_data = {
-                    'main_data': processed_data,
-                    'subreports': subreports,
-                    'parameters': validated_params,
-                    'generated_at': datetime.now().isoformat(),
-                    'locale': self.locale
-                }
-                
-                # Generate PDF
-                pdf_result = self.pdf_renderer.render_report(
-                    report_data,
-                    report_config.dict(),
-                    validated_params,
-                    output_path
-                )
-                
-                # Log generation time
-                generation_time = (datetime.now() - start_time).total_seconds()
-                logger.info(f"Report generation completed in {generation_time:.2f} seconds")
-                
-                return pdf_result
-                
-            finally:
-                # Disconnect from MongoDB
-                self.mongodb_client.disconnect()
+            
+            # Create report data structure
+            report_data = {
+                'main_data': processed_data,
+                'subreports': subreports,
+                'parameters': validated_params,
+                'generated_at': datetime.now().isoformat(),
+                'locale': self.locale
+            }
+            
+            # Generate PDF
+            pdf_result = self.pdf_renderer.render_report(
+                report_data,
+                report_config.model_dump(),
+                validated_params,
+                output_path
+            )
+            
+            # Log generation time
+            generation_time = (datetime.now() - start_time).total_seconds()
+            logger.info(f"Report generation completed in {generation_time:.2f} seconds")
+            
+            return pdf_result
                 
         except Exception as e:
             logger.error(f"Failed to generate report {report_name}: {e}")
             raise
     
+    def _fetch_main_data(self, report_config: ReportConfig,
+                         parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the main report query and process its results."""
+        if report_config.count_only:
+            # Only the total is shown, so let the server count the documents
+            return {
+                'raw_data': [],
+                'row_count': self.query_executor.execute_count_query(
+                    report_config.collection,
+                    report_config.pipeline,
+                    parameters,
+                    hint=report_config.hint
+                )
+            }
+        
+        # Execute main report query
+        main_data = self.query_executor.execute_report_query(
+            report_config.collection,
+            report_config.pipeline,
+            parameters,
+            materialize=report_config.materialize,
+            required_fields=report_config.required_fields,
+            hint=report_config.hint,
+            indexes=report_config.indexes
+        )
+        
+        # Process main data
+        return self._process_main_data(main_data, report_config)
+    
     def _process_main_data(self, data: list, report_config: ReportConfig) -> Dict[str, Any]:
         """Process main report data."""
         processed_data = {
@@ -132,6 +238,8 @@ class ReportGenerator:
     def _process_summary(self, data: list, summary_config) -> Dict[str, Any]:
         """Process summary statistics based on configuration."""
         summary = {}
+        # Rows matching each filter, shared by fields with the same filter
+        filter_counts = {}
         
         for field in summary_config.fields:
             field_name = field.name
@@ -140,9 +248,12 @@ class ReportGenerator:
             
             if field_type == "count":
                 if field_filter:
-                    # Apply filter
-                    filtered_data = self._apply_filter(data, field_filter)
-                    summary[field_name] = len(filtered_data)
+                    count = filter_counts.get(field_filter)
+                    if count is None:
+                        # Predicate results are summed as bools, so the loop stays in C
+                        count = sum(map(_compile_filter(field_filter), data))
+                        filter_counts[field_filter] = count
+                    summary[field_name] = count
                 else:
                     summary[field_name] = len(data)
             else:
@@ -151,66 +262,23 @@ class ReportGenerator:
         
         return summary
     
-    def _apply_filter(self, data: list, filter_str: str) -> list:
-        """Apply filter to data."""
-        if not filter_str:
-            return data
-        
-        filtered_data = []
-        for row in data:
-            if self._matches_filter(row, filter_str):
-                filtered_data.append(row)
-        
-        return filtered_data
-    
-    def _matches_filter(self, row: dict, filter_str: str) -> bool:
-        """Check if row matches filter."""
-        if ":" not in filter_str:
-            return True
-        
-        field, condition = filter_str.split(":", 1)
-        
-        # Get nested value
-        value = self._get_nested_value(row, field)
-        
-        if condition == "!=":
-            return value is not None and value != ""
-        elif condition.startswith("="):
-            return str(value) == condition[1:]
-        elif condition.startswith("!="):
-            return str(value) != condition[2:]
-        else:
-            return str(value) == condition
-    
-    def _get_nested_value(self, row: dict, field: str) -> Any:
-        """Get nested value from row."""
-        if "." in field:
-            parts = field.split(".")
-            value = row
-            for part in parts:
-                if isinstance(value, dict) and part in value:
-                    value = value[part]
-                else:
-                    return None
-            return value
-        else:
-            return row.get(field)
-    
     def _process_subreports(self, report_config: ReportConfig, 
                           parameters: Dict[str, Any]) -> list:
         """Process subreports."""
         if not report_config.subreports:
             return []
         
-        # Create parent context for subreports
-        parent_context = {
-            'parameters': parameters,
-            'main_data_count': len(parameters.get('main_data', [])),
-            'generated_at': datetime.now().isoformat()
-        }
+        parent_context = self._create_parent_context(parameters)
         
         # Process each subreport
-        subreports = self.subreport_processor.process_multiple_subreports(
+        if report_config.faceted_subreports:
+            process = self.subreport_processor.process_multiple_subreports_faceted
+        elif report_config.parallel_subreports:
+            process = self.subreport_processor.process_multiple_subreports_parallel
+        else:
+            process = self.subreport_processor.process_multiple_subreports
+        
+        subreports = process(
             report_config.subreports,
             parent_context,
             report_config.collection
@@ -218,26 +286,36 @@ class ReportGenerator:
         
         return subreports
     
+    def _create_parent_context(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Create the parent context subreports take their parameters from."""
+        return {
+            'parameters': parameters,
+            'main_data_count': len(parameters.get('main_data', [])),
+            'generated_at': datetime.now().isoformat()
+        }
+    
+    def warmup(self):
+        """Precompile templates and load locale data so the first report is not slower."""
+        self.template_engine.precompile_templates()
+        self.table_transformer.formatter.format_number(0)
+        self.table_transformer.formatter.format_currency(0)
+    
     def validate_report_config(self, report_name: str) -> Dict[str, Any]:
         """Validate report configuration."""
         try:
             report_config = load_report_config(report_name, self.settings.reports_dir)
             
             # Validate template
-            template_valid = self.template_engine.validate_template(report_config.template)
+            template_valid = self._validate_template(report_config.template)
             
             # Validate MongoDB connection
             mongodb_valid = self.mongodb_client.connect()
-            if mongodb_valid:
-                self.mongodb_client.disconnect()
             
             # Validate collection exists
             collection_exists = False
             if mongodb_valid:
-                if self.mongodb_client.connect():
-                    collections = self.mongodb_client.list_collections()
-                    collection_exists = report_config.collection in collections
-                    self.mongodb_client.disconnect()
+                collections = self.mongodb_client.list_collections()
+                collection_exists = report_config.collection in collections
             
             return {
                 'valid': template_valid['valid'] and mongodb_valid and collection_exists,
@@ -245,7 +323,7 @@ class ReportGenerator:
                 'template_valid': template_valid,
                 'mongodb_connected': mongodb_valid,
                 'collection_exists': collection_exists,
-                'config': report_config.dict()
+                'config': report_config.model_dump()
             }
             
         except Exception as e:
@@ -256,6 +334,34 @@ class ReportGenerator:
                 'message': f'Validation failed: {e}'
             }
     
+    def _validate_template(self, template_name: str) -> Dict[str, Any]:
+        """Validate a template, reusing the result until the template file changes."""
+        templates_dir = self.template_engine.templates_dir
+        try:
+            mtime_ns = (templates_dir / template_name).stat().st_mtime_ns
+        except OSError:
+            # Missing templates are reported by the validation itself
+            return self.template_engine.validate_template(template_name)
+        
+        key = (str(templates_dir), template_name)
+        with self._template_validation_cache_lock:
+            cached = self._template_validation_cache.get(key)
+        if cached is not None and cached[0] == mtime_ns:
+            return dict(cached[1])
+        
+        result = self.template_engine.validate_template(template_name)
+        with self._template_validation_cache_lock:
+            # Replaces the result for an earlier version of the template
+            self._template_validation_cache[key] = (mtime_ns, result)
+        return dict(result)
+    
+    @classmethod
+    def clear_caches(cls) -> None:
+        """Drop cached report configurations and template validation results."""
+        clear_report_config_cache()
+        with cls._template_validation_cache_lock:
+            cls._template_validation_cache.clear()
+    
     def list_available_reports(self) -> list:
         """List all available reports."""
         try:
@@ -323,23 +429,20 @@ class ReportGenerator:
             if not self.mongodb_client.connect():
                 raise ConnectionError("Failed to connect to MongoDB")
             
-            try:
-                # Get sample data
-                sample_data = self.query_executor.execute_simple_query(
-                    report_config.collection,
-                    limit=sample_size
-                )
-                
-                return {
-                    'success': True,
-                    'sample_data': sample_data,
-                    'sample_size': len(sample_data),
-                    'collection': report_config.collection
-                }
-                
-            finally:
-                self.mongodb_client.disconnect()
-                
+            # Get sample data
+            sample_data = self.query_executor.execute_simple_query(
+                report_config.collection,
+                projection=report_config.projected_fields(),
+                limit=sample_size
+            )
+            
+            return {
+                'success': True,
+                'sample_data': sample_data,
+                'sample_size': len(sample_data),
+                'collection': report_config.collection
+            }
+            
         except Exception as e:
             logger.error(f"Failed to generate sample data for {report_name}: {e}")
             return {
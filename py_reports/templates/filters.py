@@ -1,322 +1,435 @@
 """Custom Jinja2 filters for template rendering."""
 
 import logging
+import operator
+import textwrap
+from collections import defaultdict
+from functools import lru_cache
 from typing import Any, Optional, Union
 from datetime import datetime, date
 from decimal import Decimal
-from jinja2 import Environment
+from jinja2 import Environment, Undefined, pass_environment
+from markupsafe import Markup
 
 logger = logging.getLogger(__name__)
 
+# Sentinel for distinguishing missing keys from None values
+_MISSING = object()
 
-def register_filters(env: Environment, translator, formatter):
-    """Register custom filters with Jinja2 environment."""
-    
-    def currency_filter(value: Any, currency: str = "USD") -> str:
-        """Format value as currency."""
-        return formatter.format_currency(value, currency)
-    
-    def number_filter(value: Any, format_string: str = None) -> str:
-        """Format value as number."""
-        return formatter.format_number(value, format_string)
-    
-    def date_filter(value: Any, format_string: str = None) -> str:
-        """Format value as date."""
-        return formatter.format_date(value, format_string)
-    
-    def datetime_filter(value: Any, format_string: str = None) -> str:
-        """Format value as datetime."""
-        return formatter.format_datetime(value, format_string)
-    
-    def time_filter(value: Any, format_string: str = None) -> str:
-        """Format value as time."""
-        return formatter.format_time(value, format_string)
-    
-    def percentage_filter(value: Any, format_string: str = None) -> str:
-        """Format value as percentage."""
-        return formatter.format_percentage(value, format_string)
-    
-    def boolean_filter(value: Any, true_text: str = "Yes", false_text: str = "No") -> str:
-        """Format value as boolean."""
-        return formatter.format_boolean(value, true_text, false_text)
-    
-    def text_filter(value: Any, max_length: int = None, ellipsis: bool = True) -> str:
-        """Format value as text with optional length limit."""
-        return formatter.format_text(value, max_length, ellipsis)
-    
-    def phone_filter(value: str, country_code: str = "US") -> str:
-        """Format value as phone number."""
-        return formatter.format_phone(value, country_code)
-    
-    def filesize_filter(value: Any, binary: bool = True) -> str:
-        """Format value as file size."""
-        return formatter.format_file_size(value, binary)
-    
-    def translate_filter(key: str, **kwargs) -> str:
-        """Translation filter."""
-        return translator.translate(key, **kwargs)
-    
-    def default_filter(value: Any, default_value: str = "") -> str:
-        """Return default value if value is None or empty."""
-        if value is None or value == "":
-            return default_value
+# Ordinal suffix for each value of n % 100 (10-20 always take "th")
+_ORDINAL_SUFFIXES = tuple(
+    'th' if 10 <= n <= 20 else {1: 'st', 2: 'nd', 3: 'rd'}.get(n % 10, 'th')
+    for n in range(100)
+)
+
+# Predicates for selectattr_filter, keyed by test name
+_SELECTATTR_TESTS = {
+    None: bool,
+    'truthy': bool,
+    'falsy': operator.not_,
+    'none': lambda v: v is None,
+    'notnone': lambda v: v is not None,
+}
+
+
+@pass_environment
+def currency_filter(environment, value: Any, currency: str = "USD") -> str:
+    """Format value as currency."""
+    if value is None:
+        return ""
+    return environment.globals['_formatter'].format_currency(value, currency)
+
+
+@pass_environment
+def number_filter(environment, value: Any, format_string: str = None) -> str:
+    """Format value as number."""
+    if value is None:
+        return ""
+    return environment.globals['_formatter'].format_number(value, format_string)
+
+
+@pass_environment
+def date_filter(environment, value: Any, format_string: str = None) -> str:
+    """Format value as date."""
+    return environment.globals['_formatter'].format_date(value, format_string)
+
+
+@pass_environment
+def datetime_filter(environment, value: Any, format_string: str = None) -> str:
+    """Format value as datetime."""
+    return environment.globals['_formatter'].format_datetime(value, format_string)
+
+
+@pass_environment
+def time_filter(environment, value: Any, format_string: str = None) -> str:
+    """Format value as time."""
+    return environment.globals['_formatter'].format_time(value, format_string)
+
+
+@pass_environment
+def percentage_filter(environment, value: Any, format_string: str = None) -> str:
+    """Format value as percentage."""
+    return environment.globals['_formatter'].format_percentage(value, format_string)
+
+
+@pass_environment
+def boolean_filter(environment, value: Any, true_text: str = "Yes", false_text: str = "No") -> str:
+    """Format value as boolean."""
+    return environment.globals['_formatter'].format_boolean(value, true_text, false_text)
+
+
+@pass_environment
+def text_filter(environment, value: Any, max_length: int = None, ellipsis: bool = True) -> str:
+    """Format value as text with optional length limit."""
+    if not max_length and isinstance(value, str):
+        return value
+    return environment.globals['_formatter'].format_text(value, max_length, ellipsis)
+
+
+@pass_environment
+def phone_filter(environment, value: str, country_code: str = "US") -> str:
+    """Format value as phone number."""
+    return environment.globals['_formatter'].format_phone(value, country_code)
+
+
+@pass_environment
+def filesize_filter(environment, value: Any, binary: bool = True) -> str:
+    """Format value as file size."""
+    return environment.globals['_formatter'].format_file_size(value, binary)
+
+
+@pass_environment
+def translate_filter(environment, key: str, **kwargs) -> str:
+    """Translation filter."""
+    return environment.globals['_translator'].translate(key, **kwargs)
+
+
+def default_empty_filter(value: Any, default_value: str = "") -> str:
+    """Return default value if value is None or empty."""
+    if isinstance(value, str):
+        return value or default_value
+    if value is None:
+        return default_value
+    return str(value)
+
+
+def join_filter(value: list, separator: str = ", ") -> str:
+    """Join list items with separator."""
+    if not isinstance(value, (list, tuple)):
         return str(value)
-    
-    def join_filter(value: list, separator: str = ", ") -> str:
-        """Join list items with separator."""
-        if not isinstance(value, (list, tuple)):
-            return str(value)
-        return separator.join(str(item) for item in value)
-    
-    def split_filter(value: str, separator: str = " ") -> list:
-        """Split string by separator."""
-        if not isinstance(value, str):
-            return [str(value)]
-        return value.split(separator)
-    
-    def upper_filter(value: str) -> str:
-        """Convert string to uppercase."""
-        return str(value).upper()
-    
-    def lower_filter(value: str) -> str:
-        """Convert string to lowercase."""
-        return str(value).lower()
-    
-    def title_filter(value: str) -> str:
-        """Convert string to title case."""
-        return str(value).title()
-    
-    def capitalize_filter(value: str) -> str:
-        """Capitalize first letter of string."""
-        return str(value).capitalize()
-    
-    def truncate_filter(value: str, length: int = 50, ellipsis: str = "...") -> str:
-        """Truncate string to specified length."""
-        if not isinstance(value, str):
-            value = str(value)
-        
-        if len(value) <= length:
-            return value
-        
-        return value[:length - len(ellipsis)] + ellipsis
-    
-    def wordwrap_filter(value: str, width: int = 50) -> str:
-        """Wrap text to specified width."""
-        if not isinstance(value, str):
-            value = str(value)
-        
-        words = value.split()
-        lines = []
-        current_line = []
-        current_length = 0
-        
-        for word in words:
-            if current_length + len(word) + 1 <= width:
-                current_line.append(word)
-                current_length += len(word) + 1
-            else:
-                if current_line:
-                    lines.append(" ".join(current_line))
-                current_line = [word]
-                current_length = len(word)
-        
-        if current_line:
-            lines.append(" ".join(current_line))
-        
-        return "<br>".join(lines)
-    
-    def pluralize_filter(value: int, singular: str = "", plural: str = "s") -> str:
-        """Return singular or plural form based on count."""
-        if value == 1:
-            return singular
-        else:
-            return plural
-    
-    def ordinal_filter(value: int) -> str:
-        """Convert number to ordinal (1st, 2nd, 3rd, etc.)."""
-        if not isinstance(value, int):
-            try:
-                value = int(value)
-            except (ValueError, TypeError):
-                return str(value)
-        
-        if 10 <= value % 100 <= 20:
-            suffix = 'th'
-        else:
-            suffix = {1: 'st', 2: 'nd', 3: 'rd'}.get(value % 10, 'th')
-        
-        return f"{value}{suffix}"
-    
-    def abs_filter(value: Any) -> Any:
-        """Return absolute value."""
-        try:
-            return abs(float(value))
-        except (ValueError, TypeError):
-            return value
-    
-    def round_filter(value: Any, precision: int = 0) -> Any:
-        """Round number to specified precision."""
-        try:
-            return round(float(value), precision)
-        except (ValueError, TypeError):
-            return value
-    
-    def sum_filter(value: list) -> Any:
-        """Sum list of numbers."""
-        if not isinstance(value, (list, tuple)):
-            return value
-        
-        try:
-            return sum(float(item) for item in value if item is not None)
-        except (ValueError, TypeError):
-            return 0
-    
-    def avg_filter(value: list) -> Any:
-        """Calculate average of list of numbers."""
-        if not isinstance(value, (list, tuple)) or not value:
-            return 0
-        
-        try:
-            numbers = [float(item) for item in value if item is not None]
-            return sum(numbers) / len(numbers) if numbers else 0
-        except (ValueError, TypeError):
-            return 0
-    
-    def min_filter(value: list) -> Any:
-        """Find minimum value in list."""
-        if not isinstance(value, (list, tuple)) or not value:
-            return None
-        
-        try:
-            return min(float(item) for item in value if item is not None)
-        except (ValueError, TypeError):
-            return None
-    
-    def max_filter(value: list) -> Any:
-        """Find maximum value in list."""
-        if not isinstance(value, (list, tuple)) or not value:
-            return None
-        
+    return separator.join(map(str, value))
+
+
+def split_filter(value: str, separator: str = " ") -> list:
+    """Split string by separator."""
+    if not isinstance(value, str):
+        return [str(value)]
+    return value.split(separator)
+
+
+def upper_filter(value: str) -> str:
+    """Convert string to uppercase."""
+    if isinstance(value, str):
+        return value.upper()
+    return str(value).upper()
+
+
+def lower_filter(value: str) -> str:
+    """Convert string to lowercase."""
+    if isinstance(value, str):
+        return value.lower()
+    return str(value).lower()
+
+
+def title_filter(value: str) -> str:
+    """Convert string to title case."""
+    if isinstance(value, str):
+        return value.title()
+    return str(value).title()
+
+
+def capitalize_filter(value: str) -> str:
+    """Capitalize first letter of string."""
+    if isinstance(value, str):
+        return value.capitalize()
+    return str(value).capitalize()
+
+
+def truncate_filter(value: str, length: int = 50, ellipsis: str = "...") -> str:
+    """Truncate string to specified length."""
+    if not isinstance(value, str):
+        value = str(value)
+
+    if len(value) <= length:
+        return value
+
+    cutoff = length - len(ellipsis)
+    return f"{value[:cutoff]}{ellipsis}"
+
+
+@lru_cache(maxsize=16)
+def _text_wrapper(width: int) -> textwrap.TextWrapper:
+    """Get a shared TextWrapper for a line width."""
+    return textwrap.TextWrapper(width=width, break_long_words=False, break_on_hyphens=False)
+
+
+def wordwrap_filter(value: str, width: int = 50) -> Markup:
+    """Wrap text to specified width, joining lines with <br> and escaping the text."""
+    if not isinstance(value, str):
+        value = str(value)
+
+    return Markup("<br>").join(_text_wrapper(width).wrap(value))
+
+
+def pluralize_filter(value: int, singular: str = "", plural: str = "s") -> str:
+    """Return singular or plural form based on count."""
+    if value == 1:
+        return singular
+    else:
+        return plural
+
+
+def ordinal_filter(value: int) -> str:
+    """Convert number to ordinal (1st, 2nd, 3rd, etc.)."""
+    if not isinstance(value, int):
         try:
-            return max(float(item) for item in value if item is not None)
+            value = int(value)
         except (ValueError, TypeError):
-            return None
-    
-    def count_filter(value: list) -> int:
-        """Count items in list."""
-        if not isinstance(value, (list, tuple)):
-            return 1
-        return len(value)
-    
-    def first_filter(value: list) -> Any:
-        """Get first item from list."""
-        if not isinstance(value, (list, tuple)) or not value:
-            return None
-        return value[0]
-    
-    def last_filter(value: list) -> Any:
-        """Get last item from list."""
-        if not isinstance(value, (list, tuple)) or not value:
-            return None
-        return value[-1]
-    
-    def sort_filter(value: list, reverse: bool = False) -> list:
-        """Sort list."""
-        if not isinstance(value, (list, tuple)):
-            return [value]
-        
-        try:
-            return sorted(value, reverse=reverse)
-        except TypeError:
-            # If sorting fails, return as-is
-            return list(value)
-    
-    def unique_filter(value: list) -> list:
-        """Remove duplicates from list while preserving order."""
-        if not isinstance(value, (list, tuple)):
-            return [value]
-        
-        seen = set()
+            return str(value)
+
+    return f"{value}{_ORDINAL_SUFFIXES[value % 100]}"
+
+
+def abs_filter(value: Any) -> Any:
+    """Return absolute value."""
+    try:
+        return abs(float(value))
+    except (ValueError, TypeError):
+        return value
+
+
+def round_filter(value: Any, precision: int = 0) -> Any:
+    """Round number to specified precision."""
+    try:
+        return round(float(value), precision)
+    except (ValueError, TypeError):
+        return value
+
+
+def _as_seq(value) -> Optional[Union[list, tuple]]:
+    """Return lists/tuples as-is, materialize other iterables, and None for scalars."""
+    value_type = type(value)
+    if value_type is list or value_type is tuple:
+        return value
+    # Undefined iterates as empty, but missing variables are passed through as scalars
+    if isinstance(value, (str, bytes, dict, Undefined)) or not hasattr(value, '__iter__'):
+        return None
+    return list(value)
+
+
+def _to_floats(value) -> list:
+    """Convert non-None items to floats, keeping the loop in C where possible."""
+    if None in value:
+        value = [item for item in value if item is not None]
+    return list(map(float, value))
+
+
+def _homogeneous_sum(value) -> Optional[float]:
+    """Sum an all-numeric sequence without per-item conversion, or None if it needs one."""
+    if not value or None in value:
+        return None
+    try:
+        return float(sum(value))
+    except TypeError:
+        return None
+
+
+def sum_filter(value: list) -> Any:
+    """Sum list of numbers."""
+    items = _as_seq(value)
+    if items is None:
+        return value
+
+    total = _homogeneous_sum(items)
+    if total is not None:
+        return total
+
+    try:
+        return sum(_to_floats(items))
+    except (ValueError, TypeError):
+        return 0
+
+
+def avg_filter(value: list) -> Any:
+    """Calculate average of list of numbers."""
+    items = _as_seq(value)
+    if not items:
+        return 0
+
+    total = _homogeneous_sum(items)
+    if total is not None:
+        return total / len(items)
+
+    try:
+        numbers = _to_floats(items)
+        return sum(numbers) / len(numbers) if numbers else 0
+    except (ValueError, TypeError):
+        return 0
+
+
+def min_filter(value: list) -> Any:
+    """Find minimum value in list."""
+    items = _as_seq(value)
+    if not items:
+        return None
+
+    try:
+        return min(_to_floats(items))
+    except (ValueError, TypeError):
+        return None
+
+
+def max_filter(value: list) -> Any:
+    """Find maximum value in list."""
+    items = _as_seq(value)
+    if not items:
+        return None
+
+    try:
+        return max(_to_floats(items))
+    except (ValueError, TypeError):
+        return None
+
+
+def count_filter(value: list) -> int:
+    """Count items in list."""
+    items = _as_seq(value)
+    if items is None:
+        return 1
+    return len(items)
+
+
+def first_filter(value: list) -> Any:
+    """Get first item from list."""
+    items = _as_seq(value)
+    if not items:
+        return None
+    return items[0]
+
+
+def last_filter(value: list) -> Any:
+    """Get last item from list."""
+    items = _as_seq(value)
+    if not items:
+        return None
+    return items[-1]
+
+
+def sort_filter(value: list, reverse: bool = False, attribute: Optional[str] = None) -> list:
+    """Sort list, optionally by a key of its dict items."""
+    items = _as_seq(value)
+    if items is None:
+        return [value]
+
+    try:
+        if attribute is not None:
+            return sorted(items, key=operator.itemgetter(attribute), reverse=reverse)
+        return sorted(items, reverse=reverse)
+    except (TypeError, KeyError):
+        # If sorting fails, return as-is
+        return list(items)
+
+
+def unique_filter(value: list) -> list:
+    """Remove duplicates from list while preserving order."""
+    items = _as_seq(value)
+    if items is None:
+        return [value]
+
+    try:
+        return list(dict.fromkeys(items))
+    except TypeError:
+        # Unhashable items - fall back to a linear scan
         result = []
-        for item in value:
-            if item not in seen:
-                seen.add(item)
+        for item in items:
+            if item not in result:
                 result.append(item)
         return result
-    
-    def groupby_filter(value: list, key: str) -> dict:
-        """Group list items by key."""
-        if not isinstance(value, (list, tuple)):
-            return {}
-        
-        groups = {}
-        for item in value:
-            if isinstance(item, dict) and key in item:
-                group_key = item[key]
-                if group_key not in groups:
-                    groups[group_key] = []
+
+
+def groupby_filter(value: list, key: str) -> dict:
+    """Group list items by key."""
+    if not isinstance(value, (list, tuple)):
+        return {}
+
+    groups = defaultdict(list)
+    for item in value:
+        if isinstance(item, dict):
+            group_key = item.get(key, _MISSING)
+            if group_key is not _MISSING:
                 groups[group_key].append(item)
-        
-        return groups
-    
-    def selectattr_filter(value: list, attr: str, test: str = None) -> list:
-        """Select items from list based on attribute."""
-        if not isinstance(value, (list, tuple)):
-            return []
-        
-        result = []
-        for item in value:
-            if isinstance(item, dict) and attr in item:
-                if test is None or test == 'truthy':
-                    if item[attr]:
-                        result.append(item)
-                elif test == 'falsy':
-                    if not item[attr]:
-                        result.append(item)
-                elif test == 'none':
-                    if item[attr] is None:
-                        result.append(item)
-                elif test == 'notnone':
-                    if item[attr] is not None:
-                        result.append(item)
-        
-        return result
-    
-    # Register all filters
-    env.filters.update({
-        'currency': currency_filter,
-        'number': number_filter,
-        'date': date_filter,
-        'datetime': datetime_filter,
-        'time': time_filter,
-        'percentage': percentage_filter,
-        'boolean': boolean_filter,
-        'text': text_filter,
-        'phone': phone_filter,
-        'filesize': filesize_filter,
-        't': translate_filter,
-        'default': default_filter,
-        'join': join_filter,
-        'split': split_filter,
-        'upper': upper_filter,
-        'lower': lower_filter,
-        'title': title_filter,
-        'capitalize': capitalize_filter,
-        'truncate': truncate_filter,
-        'wordwrap': wordwrap_filter,
-        'pluralize': pluralize_filter,
-        'ordinal': ordinal_filter,
-        'abs': abs_filter,
-        'round': round_filter,
-        'sum': sum_filter,
-        'avg': avg_filter,
-        'min': min_filter,
-        'max': max_filter,
-        'count': count_filter,
-        'first': first_filter,
-        'last': last_filter,
-        'sort': sort_filter,
-        'unique': unique_filter,
-        'groupby': groupby_filter,
-        'selectattr': selectattr_filter,
-    })
\ No newline at end of file
+
+    return dict(groups)
+
+
+def selectattr_filter(value: list, attr: str, test: str = None) -> list:
+    """Select items from list based on attribute."""
+    if not isinstance(value, (list, tuple)):
+        return []
+
+    predicate = _SELECTATTR_TESTS.get(test)
+    if predicate is None:
+        return []
+
+    return [
+        item for item in value
+        if isinstance(item, dict) and attr in item and predicate(item[attr])
+    ]
+
+
+# All custom filters, built once at import. Formatter and translator
+# dependent filters look their collaborators up in the environment globals.
+_FILTERS = {
+    'currency': currency_filter,
+    'number': number_filter,
+    'date': date_filter,
+    'datetime': datetime_filter,
+    'time': time_filter,
+    'percentage': percentage_filter,
+    'boolean': boolean_filter,
+    'text': text_filter,
+    'phone': phone_filter,
+    'filesize': filesize_filter,
+    't': translate_filter,
+    'default_empty': default_empty_filter,
+    'join': join_filter,
+    'split': split_filter,
+    'upper': upper_filter,
+    'lower': lower_filter,
+    'title': title_filter,
+    'capitalize': capitalize_filter,
+    'truncate': truncate_filter,
+    'wordwrap': wordwrap_filter,
+    'pluralize': pluralize_filter,
+    'ordinal': ordinal_filter,
+    'abs': abs_filter,
+    'round': round_filter,
+    'sum': sum_filter,
+    'avg': avg_filter,
+    'min': min_filter,
+    'max': max_filter,
+    'count': count_filter,
+    'first': first_filter,
+    'last': last_filter,
+    'sort': sort_filter,
+    'unique': unique_filter,
+    'groupby': groupby_filter,
+    'selectattr': selectattr_filter,
+}
+
+
+def register_filters(env: Environment, translator, formatter):
+    """Register custom filters with Jinja2 environment."""
+    env.globals['_formatter'] = formatter
+    env.globals['_translator'] = translator
+    env.filters.update(_FILTERS)
@@ -1,10 +1,12 @@
 """Jinja2 template engine with custom filters and functions."""
 
 import logging
+from functools import lru_cache
 from typing import Dict, Any, Optional
 from pathlib import Path
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
 from jinja2.exceptions import TemplateNotFound, TemplateSyntaxError
+from ..config.settings import get_settings
 from ..translations import get_translator
 from ..transforms.data_formatter import DataFormatter
 from .filters import register_filters
@@ -26,12 +28,27 @@ class TemplateEngine:
             loader=FileSystemLoader(str(self.templates_dir)),
             autoescape=select_autoescape(['html', 'xml']),
             trim_blocks=True,
-            lstrip_blocks=True
+            lstrip_blocks=True,
+            bytecode_cache=self._create_bytecode_cache()
         )
         
         # Register custom filters and functions
         self._register_globals()
         register_filters(self.env, self.translator, self.formatter)
+        
+        # Cache compiled string templates keyed on their source
+        self._compile = lru_cache(maxsize=256)(self.env.from_string)
+    
+    def _create_bytecode_cache(self) -> Optional[FileSystemBytecodeCache]:
+        """Create the on-disk cache of compiled templates, if enabled."""
+        settings = get_settings()
+        if not settings.template_bytecode_cache:
+            return None
+        
+        cache_dir = settings.template_bytecode_cache_dir
+        if cache_dir:
+            Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        return FileSystemBytecodeCache(cache_dir)
     
     def _register_globals(self):
         """Register global functions and variables."""
@@ -140,7 +157,7 @@ class TemplateEngine:
             Rendered HTML content
         """
         try:
-            template = self.env.from_string(template_string)
+            template = self._compile(template_string)
             return template.render(**context)
         except TemplateSyntaxError as e:
             logger.error(f"Template syntax error: {e}")
@@ -195,6 +212,21 @@ class TemplateEngine:
             logger.warning(f"Failed to list templates: {e}")
             return []
     
+    def precompile_templates(self) -> int:
+        """Compile all HTML templates into the environment cache ahead of first use."""
+        compiled = 0
+        for template_name in self.list_templates():
+            if not template_name.endswith('.html'):
+                continue
+            try:
+                self.env.get_template(template_name)
+                compiled += 1
+            except Exception as e:
+                logger.warning(f"Failed to precompile template {template_name}: {e}")
+        
+        logger.info(f"Precompiled {compiled} templates")
+        return compiled
+    
     def create_report_context(self, report_data: Dict[str, Any], 
                             report_config: Dict[str, Any],
                             parameters: Dict[str, Any] = None) -> Dict[str, Any]:
@@ -1,15 +1,21 @@
 """Data formatting utilities for different data types and locales."""
 
 import logging
-from typing import Any, Optional, Union
+from functools import lru_cache, partial
+from typing import Any, Callable, List, Optional, Union
 from decimal import Decimal
 from datetime import datetime, date
 from babel import Locale
 from babel.numbers import format_number, format_currency, format_decimal, format_percent
+from babel.numbers import parse_pattern
 from babel.dates import format_date, format_datetime, format_time
 
 logger = logging.getLogger(__name__)
 
+# Babel re-parses string number patterns on every call; parsed patterns are
+# locale independent, so they can be shared by all formatter instances
+_parse_number_pattern = lru_cache(maxsize=128)(parse_pattern)
+
 
 class DataFormatter:
     """Formats data according to locale and type specifications."""
@@ -32,7 +38,8 @@ class DataFormatter:
             if format_string:
                 # Use custom format string
                 if format_string.startswith("#,##0"):
-                    return format_decimal(value, format=format_string, locale=self.babel_locale)
+                    pattern = _parse_number_pattern(format_string)
+                    return format_decimal(value, format=pattern, locale=self.babel_locale)
                 else:
                     return format_number(value, format=format_string, locale=self.babel_locale)
             else:
@@ -51,7 +58,8 @@ class DataFormatter:
         
         try:
             if format_string:
-                return format_currency(value, currency, format=format_string, locale=self.babel_locale)
+                pattern = _parse_number_pattern(format_string)
+                return format_currency(value, currency, format=pattern, locale=self.babel_locale)
             else:
                 return format_currency(value, currency, locale=self.babel_locale)
         except Exception as e:
@@ -70,7 +78,8 @@ class DataFormatter:
                 value = value * 100
             
             if format_string:
-                return format_percent(value, format=format_string, locale=self.babel_locale)
+                pattern = _parse_number_pattern(format_string)
+                return format_percent(value, format=pattern, locale=self.babel_locale)
             else:
                 return format_percent(value, locale=self.babel_locale)
         except Exception as e:
@@ -234,6 +243,40 @@ class DataFormatter:
             logger.warning(f"Failed to format file size {value}: {e}")
             return str(value)
     
+    def format_column(self, values: List[Any], value_type: str,
+                     format_string: Optional[str] = None) -> List[str]:
+        """
+        Format a whole column of same-typed values in one pass.
+        
+        Args:
+            values: Raw column values
+            value_type: Column type (number, currency, date, datetime, percentage, boolean, string)
+            format_string: Format string, or currency code for currency columns
+            
+        Returns:
+            Formatted values, with None rendered as an empty string
+        """
+        format_value = self._get_value_formatter(value_type, format_string)
+        return ["" if value is None else format_value(value) for value in values]
+    
+    def _get_value_formatter(self, value_type: str,
+                             format_string: Optional[str] = None) -> Callable[[Any], str]:
+        """Resolve the formatting callable for a column type once."""
+        if value_type == "number":
+            return partial(self.format_number, format_string=format_string)
+        elif value_type == "currency":
+            return partial(self.format_currency, currency=format_string or "USD")
+        elif value_type == "date":
+            return partial(self.format_date, format_string=format_string)
+        elif value_type == "datetime":
+            return partial(self.format_datetime, format_string=format_string)
+        elif value_type == "percentage":
+            return partial(self.format_percentage, format_string=format_string)
+        elif value_type == "boolean":
+            return self.format_boolean
+        else:
+            return str
+    
     def get_locale_info(self) -> dict:
         """Get information about the current locale."""
         return {
@@ -1,15 +1,64 @@
 """Pivot table transformation and generation."""
 
 import logging
-from typing import Dict, Any, List, Optional, Tuple, Union
-from collections import defaultdict, OrderedDict
-from decimal import Decimal
+from functools import lru_cache
+from typing import Dict, Any, Callable, List, NamedTuple, Optional, Tuple, Union
 from .data_formatter import DataFormatter
 from ..config.report_config import PivotConfig
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=None)
+def _field_accessor(field_path: str) -> Callable[[Dict[str, Any]], Any]:
+    """
+    Build a getter for a dot-notation field path, splitting the path only once.
+    
+    The getter chains dict.get calls; a missing key yields None and the next
+    .get on None (or on any non-mapping) raises AttributeError, which also
+    maps to None, so no per-segment type checks are needed.
+    """
+    parts = tuple(field_path.split('.'))
+    
+    if len(parts) == 1:
+        key = parts[0]
+        
+        def get_value(data: Dict[str, Any]) -> Any:
+            try:
+                return data.get(key)
+            except AttributeError:
+                return None
+    else:
+        def get_value(data: Dict[str, Any]) -> Any:
+            try:
+                for part in parts:
+                    data = data.get(part)
+                return data
+            except AttributeError:
+                return None
+    
+    return get_value
+
+
+class MeasureSpec(NamedTuple):
+    """Pivot measure definition with its defaults resolved."""
+    name: str
+    field: str
+    type: str
+
+
+def _compile_measures(measures: List[Dict[str, Any]]) -> List[MeasureSpec]:
+    """Resolve measure definitions once so hot loops use attribute access."""
+    return [
+        MeasureSpec(
+            name=measure.get('name', 'value'),
+            field=measure.get('field', 'value'),
+            type=measure.get('type', 'sum')
+        )
+        for measure in measures
+    ]
+
+
 class PivotTransformer:
     """Transforms data into pivot table format."""
     
@@ -30,9 +79,11 @@ class PivotTransformer:
             Formatted pivot table data
         """
         try:
-            # Extract unique values for rows and columns
-            row_values = self._extract_unique_values(data, pivot_config.rows)
-            column_values = self._extract_unique_values(data, pivot_config.columns)
+            # Extract unique values for rows and columns, keeping each data
+            # row's keys so aggregation does not have to rebuild them
+            row_values, column_values, row_keys, column_keys = self._extract_dimension_values(
+                data, pivot_config
+            )
             
             # Limit columns if needed
             if len(column_values) > pivot_config.max_columns:
@@ -40,8 +91,9 @@ class PivotTransformer:
                 logger.warning(f"Limited columns to {pivot_config.max_columns}")
             
             # Create pivot matrix
+            measures = _compile_measures(pivot_config.measures)
             pivot_matrix = self._create_pivot_matrix(
-                data, pivot_config, row_values, column_values
+                data, row_keys, column_keys, row_values, column_values, measures
             )
             
             # Generate pivot table structure
@@ -51,7 +103,7 @@ class PivotTransformer:
             
             # Calculate totals
             totals = self._calculate_pivot_totals(
-                pivot_table, pivot_config, row_values, column_values
+                pivot_matrix, pivot_table, pivot_config, row_values, column_values
             )
             
             return {
@@ -77,117 +129,163 @@ class PivotTransformer:
             logger.error(f"Failed to transform pivot data: {e}")
             raise
     
-    def _extract_unique_values(self, data: List[Dict[str, Any]], 
-                              fields: List[str]) -> List[Any]:
-        """Extract unique values for pivot dimensions."""
-        unique_values = set()
+    def _extract_dimension_values(self, data: List[Dict[str, Any]],
+                                  pivot_config: PivotConfig
+                                  ) -> Tuple[List[Any], List[Any], List[Any], List[Any]]:
+        """
+        Extract the row and column key of every data row.
         
-        for row in data:
-            # Create composite key for multiple fields
-            if len(fields) == 1:
-                value = self._get_nested_value(row, fields[0])
-                if value is not None:
-                    unique_values.add(value)
-            else:
-                # Multiple fields - create tuple key
-                key_parts = []
-                for field in fields:
-                    value = self._get_nested_value(row, field)
-                    key_parts.append(value if value is not None else "")
-                unique_values.add(tuple(key_parts))
+        Returns:
+            Sorted unique row values, sorted unique column values, and the
+            per-row row keys and column keys in data order
+        """
+        row_keys = list(map(self._dimension_getter(pivot_config.rows), data))
+        column_keys = list(map(self._dimension_getter(pivot_config.columns), data))
+        
+        row_values = set(row_keys)
+        column_values = set(column_keys)
+        
+        # Single-field dimensions skip missing values
+        row_values.discard(None)
+        column_values.discard(None)
+        
+        return sorted(row_values), sorted(column_values), row_keys, column_keys
+    
+    def _dimension_getter(self, fields: List[str]) -> Callable[[Dict[str, Any]], Any]:
+        """Build a getter for dimension values; composite keys use "" for missing parts."""
+        if len(fields) == 1:
+            return _field_accessor(fields[0])
+        
+        getters = [_field_accessor(field) for field in fields]
+        
+        def get_value(row: Dict[str, Any]) -> Tuple[Any, ...]:
+            key_parts = []
+            for get_part in getters:
+                value = get_part(row)
+                key_parts.append(value if value is not None else "")
+            return tuple(key_parts)
         
-        # Sort values
-        sorted_values = sorted(unique_values)
-        return sorted_values
+        return get_value
     
     def _create_pivot_matrix(self, data: List[Dict[str, Any]], 
-                           pivot_config: PivotConfig,
+                           row_keys: List[Any],
+                           column_keys: List[Any],
                            row_values: List[Any], 
-                           column_values: List[Any]) -> Dict[Tuple, Dict[str, Any]]:
-        """Create pivot matrix with aggregated values."""
-        matrix = defaultdict(lambda: defaultdict(lambda: defaultdict(float)))
+                           column_values: List[Any],
+                           measures: List[MeasureSpec]) -> Dict[str, Any]:
+        """
+        Create pivot matrix with aggregated values.
+        
+        Row values, column values and measure names are mapped to integer
+        codes and values are summed into a flat row x column x measure list,
+        with a parallel byte array marking which slots received a value.
+        row_keys and column_keys hold each data row's dimension keys, as
+        returned by _extract_dimension_values.
+        """
+        measure_types = {measure.name: measure.type for measure in measures}
+        measure_names = list(measure_types)
+        measure_slots = [
+            (measure_names.index(measure.name), _field_accessor(measure.field))
+            for measure in measures
+        ]
         
-        for row in data:
-            # Get row key
-            row_key = self._get_row_key(row, pivot_config.rows)
-            if row_key not in row_values:
+        measure_count = len(measure_names)
+        row_stride = len(column_values) * measure_count
+        size = len(row_values) * row_stride
+        sums = [0.0] * size
+        filled = bytearray(size)
+        
+        # Map keys straight to their offsets in the flat arrays so the
+        # per-row work is two dict lookups and an add
+        row_offsets = {value: i * row_stride for i, value in enumerate(row_values)}
+        column_offsets = {value: i * measure_count for i, value in enumerate(column_values)}
+        
+        for row, row_key, column_key in zip(data, row_keys, column_keys):
+            # Get column offset; rows in columns cut by max_columns drop out here
+            column_offset = column_offsets.get(column_key)
+            if column_offset is None:
                 continue
             
-            # Get column key
-            column_key = self._get_column_key(row, pivot_config.columns)
-            if column_key not in column_values:
+            # Get row offset
+            row_offset = row_offsets.get(row_key)
+            if row_offset is None:
                 continue
             
             # Aggregate measures
-            for measure in pivot_config.measures:
-                measure_name = measure.get('name', 'value')
-                measure_field = measure.get('field', 'value')
-                measure_type = measure.get('type', 'sum')
-                
-                value = self._get_nested_value(row, measure_field)
+            base = row_offset + column_offset
+            for slot, get_measure in measure_slots:
+                value = get_measure(row)
                 if value is not None:
                     try:
                         numeric_value = float(value)
-                        matrix[row_key][column_key][measure_name] += numeric_value
                     except (ValueError, TypeError):
-                        pass
+                        continue
+                    sums[base + slot] += numeric_value
+                    filled[base + slot] = 1
         
-        return dict(matrix)
-    
-    def _get_row_key(self, row: Dict[str, Any], row_fields: List[str]) -> Any:
-        """Get row key from data row."""
-        if len(row_fields) == 1:
-            return self._get_nested_value(row, row_fields[0])
-        else:
-            return tuple(
-                self._get_nested_value(row, field) for field in row_fields
-            )
-    
-    def _get_column_key(self, row: Dict[str, Any], column_fields: List[str]) -> Any:
-        """Get column key from data row."""
-        if len(column_fields) == 1:
-            return self._get_nested_value(row, column_fields[0])
-        else:
-            return tuple(
-                self._get_nested_value(row, field) for field in column_fields
-            )
+        return {
+            'measure_names': measure_names,
+            'measure_types': measure_types,
+            'sums': sums,
+            'filled': filled
+        }
     
-    def _generate_pivot_table(self, matrix: Dict[Tuple, Dict[str, Any]], 
+    def _generate_pivot_table(self, matrix: Dict[str, Any], 
                             row_values: List[Any], 
                             column_values: List[Any],
                             pivot_config: PivotConfig) -> List[Dict[str, Any]]:
-        """Generate pivot table structure."""
+        """
+        Generate pivot table structure.
+        
+        Each row's cells are a list aligned with column_values, so column
+        keys (often tuples) are not re-hashed into a dict for every row.
+        """
         pivot_table = []
+        measure_names = matrix['measure_names']
+        sums = matrix['sums']
+        filled = matrix['filled']
+        measure_types = matrix['measure_types']
+        measure_count = len(measure_names)
+        row_stride = len(column_values) * measure_count
+        column_offsets = [i * measure_count for i in range(len(column_values))]
+        measure_slots = list(enumerate(measure_names))
         
-        for row_value in row_values:
-            row_data = {
-                'row_key': row_value,
-                'row_label': self._format_row_label(row_value, pivot_config.rows),
-                'cells': {},
-                'row_totals': {}
-            }
-            
-            # Calculate row totals
-            row_total = defaultdict(float)
+        for row_code, row_value in enumerate(row_values):
+            base = row_code * row_stride
+            # Dense slices of this row: column-major runs of measure_count slots
+            row_sums = sums[base:base + row_stride]
+            row_filled = filled[base:base + row_stride]
             
-            for column_value in column_values:
-                cell_data = matrix.get(row_value, {}).get(column_value, {})
-                row_data['cells'][column_value] = cell_data
-                
-                # Add to row totals
-                for measure in pivot_config.measures:
-                    measure_name = measure.get('name', 'value')
-                    row_total[measure_name] += cell_data.get(measure_name, 0)
+            if measure_count == 1:
+                measure_name = measure_names[0]
+                cells = [
+                    {measure_name: value} if is_filled else {}
+                    for value, is_filled in zip(row_sums, row_filled)
+                ]
+            else:
+                cells = [
+                    {
+                        measure_name: row_sums[offset + slot]
+                        for slot, measure_name in measure_slots
+                        if row_filled[offset + slot]
+                    }
+                    for offset in column_offsets
+                ]
             
-            # Format row totals
-            for measure in pivot_config.measures:
-                measure_name = measure.get('name', 'value')
-                measure_type = measure.get('type', 'sum')
-                row_data['row_totals'][measure_name] = self._format_measure_value(
-                    row_total[measure_name], measure_type
+            # Format row totals, summed straight off this row's slice of the matrix
+            row_totals = {
+                measure_name: self._format_measure_value(
+                    sum(row_sums[slot::measure_count]), measure_types[measure_name]
                 )
+                for slot, measure_name in measure_slots
+            }
             
-            pivot_table.append(row_data)
+            pivot_table.append({
+                'row_key': row_value,
+                'row_label': self._format_row_label(row_value, pivot_config.rows),
+                'cells': cells,
+                'row_totals': row_totals
+            })
         
         return pivot_table
     
@@ -207,13 +305,14 @@ class PivotTransformer:
         else:
             return self.formatter.format_number(value)
     
-    def _calculate_pivot_totals(self, pivot_table: List[Dict[str, Any]], 
+    def _calculate_pivot_totals(self, matrix: Dict[str, Any],
+                              pivot_table: List[Dict[str, Any]], 
                               pivot_config: PivotConfig,
                               row_values: List[Any], 
                               column_values: List[Any]) -> Dict[str, Any]:
-        """Calculate column totals and grand totals."""
+        """Calculate column totals and grand totals as marginals of the pivot matrix."""
         totals = {
-            'column_totals': {},
+            'column_totals': [],
             'grand_totals': {},
             'row_totals': []
         }
@@ -221,34 +320,29 @@ class PivotTransformer:
         if not pivot_config.show_totals:
             return totals
         
-        # Calculate column totals
-        column_totals = defaultdict(float)
-        grand_totals = defaultdict(float)
+        measure_names = matrix['measure_names']
+        sums = matrix['sums']
+        measure_types = matrix['measure_types']
+        measure_count = len(measure_names)
+        row_stride = len(column_values) * measure_count
         
-        for row_data in pivot_table:
-            for column_value in column_values:
-                cell_data = row_data['cells'].get(column_value, {})
-                for measure in pivot_config.measures:
-                    measure_name = measure.get('name', 'value')
-                    value = cell_data.get(measure_name, 0)
-                    column_totals[(column_value, measure_name)] += value
-                    grand_totals[measure_name] += value
-        
-        # Format column totals
-        for (column_value, measure_name), total in column_totals.items():
-            if column_value not in totals['column_totals']:
-                totals['column_totals'][column_value] = {}
-            totals['column_totals'][column_value][measure_name] = self._format_measure_value(
-                total, next(m.get('type', 'sum') for m in pivot_config.measures 
-                          if m.get('name') == measure_name)
-            )
+        # Calculate column totals, aligned with column_values: each
+        # column/measure pair is a strided slice running down the rows
+        if row_values and measure_names:
+            totals['column_totals'] = [
+                {
+                    measure_name: self._format_measure_value(
+                        sum(sums[column_base + slot::row_stride]), measure_types[measure_name]
+                    )
+                    for slot, measure_name in enumerate(measure_names)
+                }
+                for column_base in range(0, row_stride, measure_count)
+            ]
         
         # Format grand totals
-        for measure in pivot_config.measures:
-            measure_name = measure.get('name', 'value')
-            measure_type = measure.get('type', 'sum')
+        for slot, measure_name in enumerate(measure_names):
             totals['grand_totals'][measure_name] = self._format_measure_value(
-                grand_totals[measure_name], measure_type
+                sum(sums[slot::measure_count]), measure_types[measure_name]
             )
         
         # Add row totals to totals structure
@@ -263,23 +357,10 @@ class PivotTransformer:
         
         return totals
     
-    def _get_nested_value(self, data: Dict[str, Any], field_path: str) -> Any:
-        """Get nested value from data using dot notation."""
-        try:
-            value = data
-            for part in field_path.split('.'):
-                if isinstance(value, dict) and part in value:
-                    value = value[part]
-                else:
-                    return None
-            return value
-        except Exception:
-            return None
-    
     def create_pivot_summary(self, pivot_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create summary statistics for pivot table."""
         pivot_table = pivot_data['pivot_table']
-        measures = pivot_data['config']['measures']
+        measures = _compile_measures(pivot_data['config']['measures'])
         
         summary = {
             'total_rows': len(pivot_table),
@@ -287,23 +368,24 @@ class PivotTransformer:
             'measures': {}
         }
         
+        measure_types = {measure.name: measure.type for measure in measures}
+        
+        # Collect non-zero cell values for every measure in one pass over the cells
+        values_by_measure = {measure_name: [] for measure_name in measure_types}
+        for row_data in pivot_table:
+            for cell_data in row_data['cells']:
+                for measure_name, value in cell_data.items():
+                    if value != 0 and measure_name in values_by_measure:
+                        values_by_measure[measure_name].append(value)
+        
         # Calculate measure statistics
-        for measure in measures:
-            measure_name = measure.get('name', 'value')
-            measure_type = measure.get('type', 'sum')
-            
-            all_values = []
-            for row_data in pivot_table:
-                for cell_data in row_data['cells'].values():
-                    value = cell_data.get(measure_name, 0)
-                    if value != 0:
-                        all_values.append(value)
-            
+        for measure_name, all_values in values_by_measure.items():
             if all_values:
+                total = sum(all_values)
                 summary['measures'][measure_name] = {
-                    'type': measure_type,
-                    'total': sum(all_values),
-                    'average': sum(all_values) / len(all_values),
+                    'type': measure_types[measure_name],
+                    'total': total,
+                    'average': total / len(all_values),
                     'min': min(all_values),
                     'max': max(all_values),
                     'count': len(all_values)
@@ -1,12 +1,27 @@
 """Subreport processing and context management."""
 
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Dict, Any, List, Optional
 from ..data.query_executor import QueryExecutor
 from ..config.report_config import SubreportConfig
 
 logger = logging.getLogger(__name__)
 
+# Stages that are not allowed inside a $facet sub-pipeline
+FACET_UNSAFE_STAGES = frozenset({
+    '$out', '$merge', '$facet', '$collStats', '$indexStats', '$geoNear',
+    '$search', '$searchMeta', '$changeStream', '$currentOp', '$listSessions',
+    '$planCacheStats',
+})
+
+# Runs the subreport queries of every parallel_subreports report. Queries are
+# I/O bound, so the pool is sized for many concurrent reports; jobs are single
+# queries and never wait on other jobs, so the pool cannot deadlock.
+SUBREPORT_WORKERS = 32
+_SUBREPORT_EXECUTOR = ThreadPoolExecutor(max_workers=SUBREPORT_WORKERS,
+                                         thread_name_prefix="subreports")
+
 
 class SubreportProcessor:
     """Processes subreports with context parameter passing."""
@@ -41,24 +56,29 @@ class SubreportProcessor:
                 context_params
             )
             
-            # Process subreport data
-            processed_data = {
-                'name': subreport_config.name,
-                'template': subreport_config.template,
-                'data': subreport_data,
-                'context_params': context_params,
-                'page_break_before': subreport_config.page_break_before,
-                'page_break_after': subreport_config.page_break_after,
-                'row_count': len(subreport_data)
-            }
-            
-            logger.info(f"Processed subreport '{subreport_config.name}' with {len(subreport_data)} rows")
-            return processed_data
+            return self._build_subreport(subreport_config, subreport_data, context_params)
             
         except Exception as e:
             logger.error(f"Failed to process subreport '{subreport_config.name}': {e}")
             raise
     
+    def _build_subreport(self, subreport_config: SubreportConfig,
+                         subreport_data: List[Dict[str, Any]],
+                         context_params: Dict[str, Any]) -> Dict[str, Any]:
+        """Build processed subreport data from its query results."""
+        processed_data = {
+            'name': subreport_config.name,
+            'template': subreport_config.template,
+            'data': subreport_data,
+            'context_params': context_params,
+            'page_break_before': subreport_config.page_break_before,
+            'page_break_after': subreport_config.page_break_after,
+            'row_count': len(subreport_data)
+        }
+        
+        logger.info(f"Processed subreport '{subreport_config.name}' with {len(subreport_data)} rows")
+        return processed_data
+    
     def _extract_context_parameters(self, context_params: List[str], 
                                    parent_context: Dict[str, Any]) -> Dict[str, Any]:
         """Extract context parameters from parent context."""
@@ -76,28 +96,139 @@ class SubreportProcessor:
                                   parent_context: Dict[str, Any],
                                   collection_name: str) -> List[Dict[str, Any]]:
         """Process multiple subreports."""
-        subreports = []
+        return [
+            self._process_subreport_safely(subreport_config, parent_context, collection_name)
+            for subreport_config in subreport_configs
+        ]
+    
+    def process_multiple_subreports_parallel(self, subreport_configs: List[SubreportConfig],
+                                           parent_context: Dict[str, Any],
+                                           collection_name: str) -> List[Dict[str, Any]]:
+        """
+        Process multiple subreports concurrently.
         
-        for subreport_config in subreport_configs:
-            try:
-                subreport = self.process_subreport(
-                    subreport_config, parent_context, collection_name
-                )
-                subreports.append(subreport)
-            except Exception as e:
-                logger.error(f"Failed to process subreport '{subreport_config.name}': {e}")
-                # Continue with other subreports
-                subreports.append({
-                    'name': subreport_config.name,
-                    'template': subreport_config.template,
-                    'data': [],
-                    'error': str(e),
-                    'page_break_before': subreport_config.page_break_before,
-                    'page_break_after': subreport_config.page_break_after,
-                    'row_count': 0
-                })
+        Subreport queries are I/O bound, so running them on the shared pool
+        makes the total wait roughly that of the slowest query. Results keep
+        the order of subreport_configs.
+        """
+        if len(subreport_configs) < 2:
+            return self.process_multiple_subreports(
+                subreport_configs, parent_context, collection_name
+            )
+        
+        return self.collect_subreports(
+            self.submit_subreports(subreport_configs, parent_context, collection_name)
+        )
+    
+    def submit_subreports(self, subreport_configs: List[SubreportConfig],
+                          parent_context: Dict[str, Any],
+                          collection_name: str) -> List[Future]:
+        """
+        Start each subreport on the shared pool.
+        
+        Returns:
+            Futures of the processed subreports, in the order of subreport_configs;
+            pass them to collect_subreports
+        """
+        return [
+            _SUBREPORT_EXECUTOR.submit(
+                self._process_subreport_safely, subreport_config, parent_context, collection_name
+            )
+            for subreport_config in subreport_configs
+        ]
+    
+    def collect_subreports(self, futures: List[Future]) -> List[Dict[str, Any]]:
+        """
+        Wait for subreports started by submit_subreports and return them in order.
         
-        return subreports
+        If waiting is interrupted, the remaining subreports are cancelled
+        with cancel_subreports before the error propagates.
+        """
+        try:
+            return [future.result() for future in futures]
+        finally:
+            self.cancel_subreports(futures)
+    
+    def cancel_subreports(self, futures: List[Future]) -> None:
+        """Cancel subreports that have not started and wait for running ones."""
+        for future in futures:
+            if not future.cancel():
+                # Subreport errors are caught per job, so this only waits
+                future.exception()
+    
+    def process_multiple_subreports_faceted(self, subreport_configs: List[SubreportConfig],
+                                          parent_context: Dict[str, Any],
+                                          collection_name: str) -> List[Dict[str, Any]]:
+        """
+        Process multiple subreports with one $facet query.
+        
+        All subreport pipelines run in a single round-trip. Pipelines inside
+        $facet cannot use indexes and the combined result must fit in one
+        16MB document, so this suits small subreports over a shared scan.
+        Falls back to separate queries when a pipeline cannot be faceted or
+        the combined query fails.
+        """
+        if len(subreport_configs) < 2 or not all(
+            self._is_facet_safe(subreport_config.pipeline)
+            for subreport_config in subreport_configs
+        ):
+            return self.process_multiple_subreports(
+                subreport_configs, parent_context, collection_name
+            )
+        
+        context_params = [
+            self._extract_context_parameters(subreport_config.context_params, parent_context)
+            for subreport_config in subreport_configs
+        ]
+        
+        try:
+            results = self.query_executor.execute_faceted_queries(
+                collection_name,
+                [
+                    (subreport_config.pipeline, params)
+                    for subreport_config, params in zip(subreport_configs, context_params)
+                ]
+            )
+        except Exception as e:
+            logger.warning(f"Faceted subreport query failed, running subreports separately: {e}")
+            return self.process_multiple_subreports(
+                subreport_configs, parent_context, collection_name
+            )
+        
+        return [
+            self._build_subreport(subreport_config, subreport_data, params)
+            for subreport_config, subreport_data, params
+            in zip(subreport_configs, results, context_params)
+        ]
+    
+    def _is_facet_safe(self, pipeline: List[Dict[str, Any]]) -> bool:
+        """Check whether a pipeline can run as a $facet sub-pipeline."""
+        return bool(pipeline) and not any(
+            stage_name in FACET_UNSAFE_STAGES
+            for stage in pipeline
+            for stage_name in stage
+        )
+    
+    def _process_subreport_safely(self, subreport_config: SubreportConfig,
+                                 parent_context: Dict[str, Any],
+                                 collection_name: str) -> Dict[str, Any]:
+        """Process a subreport, returning an empty error entry if it fails."""
+        try:
+            return self.process_subreport(
+                subreport_config, parent_context, collection_name
+            )
+        except Exception as e:
+            logger.error(f"Failed to process subreport '{subreport_config.name}': {e}")
+            # Continue with other subreports
+            return {
+                'name': subreport_config.name,
+                'template': subreport_config.template,
+                'data': [],
+                'error': str(e),
+                'page_break_before': subreport_config.page_break_before,
+                'page_break_after': subreport_config.page_break_after,
+                'row_count': 0
+            }
     
     def validate_subreport_context(self, subreport_config: SubreportConfig,
                                  parent_context: Dict[str, Any]) -> List[str]:
@@ -5,7 +5,7 @@ from typing import Dict, Any, List, Optional, Union
 from decimal import Decimal
 from datetime import datetime, date
 from .data_formatter import DataFormatter
-from ..config.report_config import ColumnConfig
+from ..config.report_config import ColumnConfig, compile_row_extractor
 
 logger = logging.getLogger(__name__)
 
@@ -75,60 +75,30 @@ class TableTransformer:
     
     def _transform_rows(self, data: List[Dict[str, Any]], 
                        columns: List[ColumnConfig]) -> List[Dict[str, Any]]:
-        """Transform data rows with formatting."""
-        rows = []
+        """Transform data rows with formatting, one column at a time."""
+        rows = [{} for _ in data]
         
-        for index, row_data in enumerate(data, 1):
-            row = {}
+        # Read every column of a document in one call, then transpose to columns
+        extract = compile_row_extractor(tuple(col.field for col in columns))
+        column_values = list(zip(*map(extract, data))) or [()] * len(columns)
+        
+        for col, values in zip(columns, column_values):
+            # Special handling for "No" field - use row number starting from 1
+            if col.field == "No":
+                values = range(1, len(data) + 1)
             
-            for col in columns:
-                field_value = self._get_nested_value(row_data, col.field)
-                
-                # Special handling for "No" field - use row number starting from 1
-                if col.field == "No":
-                    field_value = index
-                
-                formatted_value = self._format_cell_value(field_value, col)
-                
+            formatted_values = self.formatter.format_column(values, col.type, col.format)
+            
+            for row, field_value, formatted_value in zip(rows, values, formatted_values):
                 row[col.field] = {
                     'raw_value': field_value,
                     'formatted_value': formatted_value,
                     'type': col.type,
                     'align': col.align
                 }
-            
-            rows.append(row)
         
         return rows
     
-    def _format_cell_value(self, value: Any, column: ColumnConfig) -> str:
-        """Format cell value according to column configuration."""
-        if value is None:
-            return ""
-        
-        try:
-            if column.type == "string":
-                return str(value)
-            elif column.type == "number":
-                return self.formatter.format_number(value, column.format)
-            elif column.type == "currency":
-                currency = column.format or "USD"
-                return self.formatter.format_currency(value, currency)
-            elif column.type == "date":
-                return self.formatter.format_date(value, column.format)
-            elif column.type == "datetime":
-                return self.formatter.format_datetime(value, column.format)
-            elif column.type == "percentage":
-                return self.formatter.format_percentage(value, column.format)
-            elif column.type == "boolean":
-                return self.formatter.format_boolean(value)
-            else:
-                return str(value)
-                
-        except Exception as e:
-            logger.warning(f"Failed to format value {value} for column {column.field}: {e}")
-            return str(value)
-    
     def _get_nested_value(self, data: Dict[str, Any], field_path: str) -> Any:
         """Get nested value from data using dot notation."""
         try:
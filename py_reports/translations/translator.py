@@ -3,6 +3,7 @@
 import os
 import yaml
 import logging
+from functools import lru_cache
 from typing import Dict, Any, Optional, Union
 from pathlib import Path
 from babel import Locale
@@ -11,6 +12,12 @@ from babel.dates import format_date, format_datetime, format_time
 from datetime import datetime, date
 from decimal import Decimal
 
+# Use the libyaml-backed loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as YamlSafeLoader
+except ImportError:
+    from yaml import SafeLoader as YamlSafeLoader
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,6 +30,9 @@ class Translator:
         self._translations: Dict[str, Dict[str, Any]] = {}
         self._loaded_locales: set = set()
         
+        # Memoized translate() results keyed on (key, locale, sorted kwargs)
+        self._cached_translate = lru_cache(maxsize=4096)(self._translate_items)
+        
         # Load default locale
         self._load_locale(default_locale)
     
@@ -42,7 +52,7 @@ class Translator:
         
         try:
             with open(locale_file, 'r', encoding='utf-8') as f:
-                translations = yaml.safe_load(f)
+                translations = yaml.load(f, Loader=YamlSafeLoader)
                 self._translations[locale] = translations or {}
                 self._loaded_locales.add(locale)
                 logger.info(f"Loaded translations for locale: {locale}")
@@ -66,6 +76,20 @@ class Translator:
         if locale is None:
             locale = self.default_locale
         
+        try:
+            # Values carry their type, as 1, 1.0 and True are equal keys but format differently
+            items = tuple((name, type(value), value) for name, value in sorted(kwargs.items()))
+            return self._cached_translate(key, locale, items)
+        except TypeError:
+            # Unhashable parameter values cannot be cached
+            return self._translate(key, locale, **kwargs)
+    
+    def _translate_items(self, key: str, locale: str, items: tuple) -> str:
+        """Translate with parameters passed as a hashable tuple of (name, type, value) items."""
+        return self._translate(key, locale, **{name: value for name, _, value in items})
+    
+    def _translate(self, key: str, locale: str, **kwargs) -> str:
+        """Resolve a translation key without caching."""
         # Load locale if not already loaded
         if locale not in self._loaded_locales:
             self._load_locale(locale)
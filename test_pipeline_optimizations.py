@@ -0,0 +1,590 @@
+#!/usr/bin/env python3
+"""Test script for pipeline parameter substitution, optimization and row extraction."""
+
+import sys
+import copy
+from pathlib import Path
+from datetime import date, datetime
+
+# Add the project root to Python path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from py_reports.config.report_config import ReportConfig, PivotConfig, compile_row_extractor
+from py_reports.data.pipeline_builder import PipelineBuilder
+from py_reports.data.query_executor import QueryExecutor, _substitute
+from py_reports.renderer import ReportGenerator
+from py_reports.transforms.pivot_transformer import PivotTransformer
+from py_reports.transforms.table_transformer import TableTransformer
+
+# Sample collections used by the in-memory pipeline evaluator
+PERSONS = [
+    {"_id": 1, "name": "Anna", "status": "active", "dept": "d1", "age": 31,
+     "address": {"city": "Warsaw"}},
+    {"_id": 2, "name": "Jan", "status": "inactive", "dept": "d2", "age": 45,
+     "address": {"city": "Krakow"}},
+    {"_id": 3, "name": "Ewa", "status": "active", "dept": "d1", "age": 27,
+     "address": None},
+    {"_id": 4, "name": "Piotr", "status": "active", "dept": "d3", "age": 52,
+     "address": {"city": "Warsaw"}},
+]
+DEPARTMENTS = [
+    {"_id": "d1", "title": "Sales", "tags": ["a", "b"]},
+    {"_id": "d2", "title": "IT", "tags": ["c"]},
+]
+
+
+def _get_path(doc, path):
+    """Follow a dotted path like the server does for scalar fields."""
+    for part in path.split('.'):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def _eval_expression(doc, expression):
+    """Evaluate a "$path" reference or a constant."""
+    if isinstance(expression, str) and expression.startswith('$'):
+        return _get_path(doc, expression[1:])
+    if isinstance(expression, dict):
+        return {key: _eval_expression(doc, value) for key, value in expression.items()}
+    return expression
+
+
+def _matches(doc, query):
+    """Evaluate the $match operators the tests use."""
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(_matches(doc, sub_query) for sub_query in condition):
+                return False
+            continue
+        value = _get_path(doc, key)
+        if isinstance(condition, dict) and condition and all(op.startswith('$') for op in condition):
+            for op, operand in condition.items():
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$gte" and not (value is not None and value >= operand):
+                    return False
+                if op == "$lt" and not (value is not None and value < operand):
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def run_pipeline(docs, pipeline):
+    """Run a pipeline over in-memory documents with a small subset of MongoDB semantics."""
+    collections = {"departments": DEPARTMENTS}
+    docs = [copy.deepcopy(doc) for doc in docs]
+
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            docs = [doc for doc in docs if _matches(doc, spec)]
+        elif name == "$lookup":
+            foreign = collections[spec["from"]]
+            for doc in docs:
+                local = _get_path(doc, spec["localField"])
+                doc[spec["as"]] = [
+                    copy.deepcopy(other) for other in foreign
+                    if _get_path(other, spec["foreignField"]) == local
+                ]
+        elif name == "$unwind":
+            path = (spec if isinstance(spec, str) else spec["path"])[1:]
+            preserve = isinstance(spec, dict) and spec.get("preserveNullAndEmptyArrays")
+            unwound = []
+            for doc in docs:
+                values = doc.get(path)
+                if not values:
+                    if preserve:
+                        unwound.append({k: v for k, v in doc.items() if k != path})
+                    continue
+                for value in values:
+                    unwound.append({**doc, path: value})
+            docs = unwound
+        elif name in ("$addFields", "$set"):
+            docs = [{**doc, **{k: _eval_expression(doc, v) for k, v in spec.items()}} for doc in docs]
+        elif name == "$project":
+            projected = []
+            for doc in docs:
+                result = {} if spec.get("_id") in (0, False) else {"_id": doc.get("_id")}
+                for field, value in spec.items():
+                    if field == "_id" and value in (0, False):
+                        continue
+                    if value is True or value == 1:
+                        if field in doc:
+                            result[field] = doc[field]
+                    else:
+                        result[field] = _eval_expression(doc, value)
+                projected.append(result)
+            docs = projected
+        elif name == "$group":
+            groups = {}
+            for doc in docs:
+                key = _eval_expression(doc, spec["_id"])
+                group = groups.setdefault(repr(key), {"_id": key})
+                for field, accumulator in spec.items():
+                    if field == "_id":
+                        continue
+                    (op, operand), = accumulator.items()
+                    if op == "$sum":
+                        value = _eval_expression(doc, operand)
+                        group[field] = group.get(field, 0) + (value if isinstance(value, (int, float)) else 0)
+            docs = list(groups.values())
+        elif name == "$sort":
+            for field, direction in reversed(list(spec.items())):
+                docs.sort(key=lambda doc: (_get_path(doc, field) is None, _get_path(doc, field)),
+                          reverse=direction < 0)
+        elif name == "$limit":
+            docs = docs[:spec]
+        else:
+            raise ValueError(f"Unsupported stage in test evaluator: {name}")
+
+    return docs
+
+
+def _canonical(docs):
+    """Order-insensitive form of a result set."""
+    return sorted(repr(sorted(doc.items(), key=lambda item: item[0])) for doc in docs)
+
+
+class RecordingMongoDBClient:
+    """MongoDB client answering aggregations from PERSONS and recording the pipelines."""
+
+    def __init__(self):
+        self.pipelines = []
+
+    def iter_aggregation(self, collection_name, pipeline, batch_size=None, hint=None):
+        self.pipelines.append(pipeline)
+        return iter(run_pipeline(PERSONS, pipeline))
+
+    def execute_aggregation(self, collection_name, pipeline, hint=None):
+        self.pipelines.append(pipeline)
+        if pipeline[-1] == {"$count": "count"}:
+            results = run_pipeline(PERSONS, pipeline[:-1])
+            return [{"count": len(results)}] if results else []
+        return run_pipeline(PERSONS, pipeline)
+
+
+def test_parameter_substitution():
+    """Test full-marker and embedded-marker substitution without mutating the pipeline."""
+    print("Testing parameter substitution...")
+
+    try:
+        executor = QueryExecutor(RecordingMongoDBClient())
+        pipeline = [
+            {"$match": {
+                "status": {"$in": "{{statuses}}"},
+                "age": {"$gte": "{{min_age}}"},
+                "createdAt": {"$gte": "{{from_date}}"},
+                "note": "Age at least {{min_age}} for {{statuses}}",
+                "other": "{{missing}}",
+                "$and": [{"dept": "{{dept}}"}, {"label": "dept-{{dept}}"}]
+            }},
+            {"$project": {"name": 1, "tag": "{{dept}}"}},
+            {"$limit": 10}
+        ]
+        original = copy.deepcopy(pipeline)
+        parameters = {
+            "statuses": ("active", "inactive"),
+            "min_age": 30,
+            "from_date": date(2025, 1, 15),
+            "dept": "d1",
+            "unused": None
+        }
+
+        # Run twice so the second run patches from the cached marker sites
+        first = executor._substitute_parameters(pipeline, parameters)
+        second = executor._substitute_parameters(pipeline, parameters)
+
+        match = first[0]["$match"]
+        checks = [
+            # A full marker keeps the parameter's type
+            (match["status"]["$in"] == ["active", "inactive"], "list parameter kept as list"),
+            (match["age"]["$gte"] == 30 and type(match["age"]["$gte"]) is int, "number kept as int"),
+            (match["createdAt"]["$gte"] == datetime(2025, 1, 15), "date stored as datetime"),
+            # An embedded marker becomes text
+            (match["note"] == "Age at least 30 for ['active', 'inactive']", "embedded markers as text"),
+            (match["$and"][1]["label"] == "dept-d1", "embedded marker in nested list"),
+            # A marker without a value is left as it is
+            (match["other"] == "{{missing}}", "missing parameter left as marker"),
+            (first[1]["$project"]["tag"] == "d1", "marker in a later stage"),
+            (first == second, "cached marker sites give the same result"),
+            # Copy-on-path patching matches a full copying walk
+            (first == _substitute(pipeline, executor_values(parameters)), "matches full walk"),
+            # The input pipeline is unchanged and untouched stages are shared
+            (pipeline == original, "input pipeline unchanged"),
+            (first[2] is pipeline[2], "stages without markers are not copied"),
+        ]
+
+        # Markers in dict keys take the full walk
+        keyed = [{"$group": {"_id": "$dept", "{{measure}}": {"$sum": 1}}}]
+        keyed_original = copy.deepcopy(keyed)
+        substituted = executor._substitute_parameters(keyed, {"measure": "total"})
+        checks.append((substituted == [{"$group": {"_id": "$dept", "total": {"$sum": 1}}}],
+                       "marker in dict key"))
+        checks.append((keyed == keyed_original, "keyed pipeline unchanged"))
+
+        return _report(checks, "Parameter substitution")
+
+    except Exception as e:
+        print(f"✗ Error testing parameter substitution: {e}")
+        return False
+
+
+def executor_values(parameters):
+    """Parameter values as _substitute_parameters converts them."""
+    values = {}
+    for name, value in parameters.items():
+        if value is None:
+            continue
+        if isinstance(value, date) and not isinstance(value, datetime):
+            value = datetime.combine(value, datetime.min.time())
+        if isinstance(value, tuple):
+            value = list(value)
+        values[name] = value
+    return values
+
+
+def test_optimize_pipeline():
+    """Test $match push-down, merging and project/group folding keep results unchanged."""
+    print("Testing pipeline optimization...")
+
+    try:
+        lookup = {"$lookup": {"from": "departments", "localField": "dept",
+                              "foreignField": "_id", "as": "department"}}
+        pipelines = {
+            "push-down": [
+                lookup,
+                {"$unwind": "$department"},
+                {"$match": {"status": "active"}},
+                {"$match": {"age": {"$gte": 30}}},
+            ],
+            "blocked": [
+                lookup,
+                {"$unwind": "$department"},
+                {"$match": {"department.title": "Sales"}},
+            ],
+            "project-group": [
+                {"$match": {"status": "active"}},
+                {"$project": {"d": "$dept", "age": 1}},
+                {"$group": {"_id": "$d", "total": {"$sum": "$age"}, "count": {"$sum": 1}}},
+            ],
+            "same-field": [
+                {"$match": {"age": {"$gte": 30}}},
+                {"$match": {"age": {"$lt": 50}}},
+            ],
+        }
+        originals = copy.deepcopy(pipelines)
+
+        checks = []
+        optimized = {}
+        for name, pipeline in pipelines.items():
+            optimized[name] = PipelineBuilder.optimize_pipeline(pipeline)
+            checks.append((
+                _canonical(run_pipeline(PERSONS, optimized[name]))
+                == _canonical(run_pipeline(PERSONS, pipeline)),
+                f"{name}: same results"
+            ))
+            checks.append((pipeline == originals[name], f"{name}: input unchanged"))
+
+        checks.extend([
+            (optimized["push-down"][0] == {"$match": {"status": "active", "age": {"$gte": 30}}},
+             "matches pushed before the join and merged"),
+            (optimized["blocked"] == pipelines["blocked"],
+             "match on a joined field stays after the join"),
+            (optimized["project-group"] == [
+                {"$match": {"status": "active"}},
+                {"$group": {"_id": "$dept", "total": {"$sum": "$age"}, "count": {"$sum": 1}}},
+            ], "renaming project folded into group"),
+            (optimized["same-field"] == [
+                {"$match": {"$and": [{"age": {"$gte": 30}}, {"age": {"$lt": 50}}]}},
+            ], "matches on one field merged with $and"),
+        ])
+
+        # Indexed filters also move past $sort and unrelated $addFields
+        indexed = [
+            {"$addFields": {"label": "$name"}},
+            {"$sort": {"age": 1}},
+            {"$match": {"dept": "d1"}},
+        ]
+        promoted = PipelineBuilder.optimize_pipeline(indexed, indexes=["dept"])
+        checks.append((promoted[0] == {"$match": {"dept": "d1"}}, "indexed match promoted"))
+        checks.append((run_pipeline(PERSONS, promoted) == run_pipeline(PERSONS, indexed),
+                       "indexed promotion keeps results and order"))
+
+        return _report(checks, "Pipeline optimization")
+
+    except Exception as e:
+        print(f"✗ Error testing pipeline optimization: {e}")
+        return False
+
+
+def test_project_early():
+    """Test that early projection keeps every field later stages and the report read."""
+    print("Testing early projection...")
+
+    try:
+        pipeline = [
+            {"$match": {"status": "active"}},
+            {"$lookup": {"from": "departments", "localField": "dept",
+                         "foreignField": "_id", "as": "department"}},
+            {"$sort": {"age": -1}},
+        ]
+        original = copy.deepcopy(pipeline)
+        projected = PipelineBuilder.project_early(pipeline, ["name", "address.city"])
+
+        expected_projection = {"$project": {
+            "address": 1, "age": 1, "dept": 1, "name": 1
+        }}
+        fields = ("name", "address.city", "department", "age")
+        extract = compile_row_extractor(fields)
+
+        checks = [
+            (projected[0] == pipeline[0], "leading match kept first"),
+            (projected[1] == expected_projection, "projection after the leading match"),
+            (list(map(extract, run_pipeline(PERSONS, projected)))
+             == list(map(extract, run_pipeline(PERSONS, pipeline))), "same values for read fields"),
+            (pipeline == original, "input pipeline unchanged"),
+            # Stages reading the whole document prevent the projection
+            (PipelineBuilder.project_early(
+                pipeline + [{"$replaceRoot": {"newRoot": "$$ROOT"}}], ["name"]
+            ) == pipeline + [{"$replaceRoot": {"newRoot": "$$ROOT"}}], "unknown stage left alone"),
+        ]
+
+        return _report(checks, "Early projection")
+
+    except Exception as e:
+        print(f"✗ Error testing early projection: {e}")
+        return False
+
+
+def reference_pivot(data, rows, columns, measures):
+    """Straightforward pivot: nested dicts of sums per row, column and measure."""
+    def key(row, fields):
+        if len(fields) == 1:
+            return _get_path(row, fields[0])
+        return tuple(
+            value if value is not None else "" for value in (_get_path(row, f) for f in fields)
+        )
+
+    row_values = sorted({key(row, rows) for row in data} - {None})
+    column_values = sorted({key(row, columns) for row in data} - {None})
+    matrix = {}
+    for row in data:
+        row_key, column_key = key(row, rows), key(row, columns)
+        if row_key is None or column_key is None:
+            continue
+        cell = matrix.setdefault(row_key, {}).setdefault(column_key, {})
+        for measure in measures:
+            value = _get_path(row, measure.get('field', 'value'))
+            try:
+                numeric_value = float(value)
+            except (ValueError, TypeError):
+                continue
+            name = measure.get('name', 'value')
+            cell[name] = cell.get(name, 0.0) + numeric_value
+    return row_values, column_values, matrix
+
+
+def test_pivot_accumulator():
+    """Test the flat pivot accumulator against a nested-dict reference."""
+    print("Testing pivot accumulator...")
+
+    try:
+        data = [
+            {"region": "North", "year": 2024, "sales": 10, "cost": "4.5", "meta": {"q": "Q1"}},
+            {"region": "North", "year": 2025, "sales": 7, "cost": None, "meta": {"q": "Q2"}},
+            {"region": "South", "year": 2024, "sales": "x", "cost": 2, "meta": {"q": "Q1"}},
+            {"region": "South", "year": 2024, "sales": 5.5, "cost": 1, "meta": None},
+            {"region": None, "year": 2024, "sales": 100, "cost": 100},
+            {"region": "East", "year": None, "sales": 3, "cost": 3},
+        ]
+        measures = [
+            {"name": "sales", "field": "sales", "type": "sum"},
+            {"name": "cost", "field": "cost", "type": "sum"},
+        ]
+        transformer = PivotTransformer()
+        checks = []
+
+        for rows, columns in ((["region"], ["year"]), (["region", "meta.q"], ["year"])):
+            config = PivotConfig(rows=rows, columns=columns, measures=measures)
+            result = transformer.transform_pivot_data(data, config)
+            row_values, column_values, matrix = reference_pivot(data, rows, columns, measures)
+
+            checks.append((result['row_values'] == row_values, f"{rows}: row values"))
+            checks.append((result['column_values'] == column_values, f"{rows}: column values"))
+
+            cells_match = all(
+                dict(zip(column_values, row_data['cells']))
+                == {column: matrix.get(row_data['row_key'], {}).get(column, {})
+                    for column in column_values}
+                for row_data in result['pivot_table']
+            )
+            checks.append((cells_match, f"{rows}: cells"))
+
+            grand_totals = {
+                measure['name']: transformer.formatter.format_number(
+                    sum(cell.get(measure['name'], 0) for cells in matrix.values()
+                        for cell in cells.values())
+                )
+                for measure in measures
+            }
+            checks.append((result['totals']['grand_totals'] == grand_totals, f"{rows}: grand totals"))
+
+            column_totals = [
+                {
+                    measure['name']: transformer.formatter.format_number(
+                        sum(matrix.get(row, {}).get(column, {}).get(measure['name'], 0)
+                            for row in row_values)
+                    )
+                    for measure in measures
+                }
+                for column in column_values
+            ]
+            checks.append((result['totals']['column_totals'] == column_totals, f"{rows}: column totals"))
+
+        # Columns beyond max_columns drop out of the matrix
+        limited = transformer.transform_pivot_data(
+            data, PivotConfig(rows=["region"], columns=["year"], measures=measures, max_columns=1)
+        )
+        checks.append((limited['column_values'] == [2024]
+                       and all(len(row['cells']) == 1 for row in limited['pivot_table']),
+                       "max_columns limits the cells"))
+
+        return _report(checks, "Pivot accumulator")
+
+    except Exception as e:
+        print(f"✗ Error testing pivot accumulator: {e}")
+        return False
+
+
+def test_row_extractor():
+    """Test generated row extractors against the nested lookup they replace."""
+    print("Testing row extractor...")
+
+    try:
+        data = [
+            {"name": "Anna", "address": {"city": "Warsaw", "geo": {"lat": 52.2}}},
+            {"name": "Jan", "address": None},
+            {"name": "Ewa", "address": "unknown"},
+            {"address": {"city": "Krakow"}},
+            {},
+        ]
+        lookup = TableTransformer()._get_nested_value
+        checks = []
+
+        for fields in (("name",), ("name", "address.city", "address.geo.lat"), ("a'b", "x.y'z")):
+            extract = compile_row_extractor(fields)
+            expected = [tuple(lookup(row, field) for field in fields) for row in data]
+            checks.append((list(map(extract, data)) == expected, f"{fields}: same values"))
+
+        checks.append((compile_row_extractor(("name",))({"name": 1}) == (1,),
+                       "single column returns a tuple"))
+        checks.append((compile_row_extractor(("name",)) is compile_row_extractor(("name",)),
+                       "extractors are cached"))
+
+        return _report(checks, "Row extractor")
+
+    except Exception as e:
+        print(f"✗ Error testing row extractor: {e}")
+        return False
+
+
+def test_report_config_unchanged():
+    """Test that running a report query leaves the cached config pipeline unchanged."""
+    print("Testing report config immutability...")
+
+    try:
+        config = ReportConfig(
+            name="test",
+            collection="persons",
+            template="test.html",
+            pipeline=[
+                {"$lookup": {"from": "departments", "localField": "dept",
+                             "foreignField": "_id", "as": "department"}},
+                {"$match": {"status": "{{status}}", "age": {"$gte": "{{min_age}}"}}},
+                {"$sort": {"age": 1}},
+            ],
+            required_fields=["name", "age", "department"],
+            indexes=["status"],
+        )
+        original = copy.deepcopy(config.pipeline)
+
+        client = RecordingMongoDBClient()
+        generator = ReportGenerator()
+        generator.query_executor = QueryExecutor(client)
+
+        results = [
+            generator._fetch_main_data(config, {"status": "active", "min_age": 30})
+            for _ in range(2)
+        ]
+        count_config = config.model_copy(update={"count_only": True})
+        count = generator._fetch_main_data(count_config, {"status": "active", "min_age": 30})
+
+        expected = run_pipeline(PERSONS, _substitute(original, {"status": "active", "min_age": 30}))
+        names = [row["name"] for row in results[0]["raw_data"]]
+
+        checks = [
+            (config.pipeline == original, "config pipeline unchanged"),
+            (results[0]["raw_data"] == results[1]["raw_data"], "repeated runs agree"),
+            (names == [row["name"] for row in expected], "same rows as the unoptimized pipeline"),
+            ({"$match": {"status": "active", "age": {"$gte": 30}}} in client.pipelines[0][:2],
+             "parameters substituted and filter run before the join"),
+            (count["row_count"] == len(expected), "count query counts the same rows"),
+        ]
+
+        return _report(checks, "Report config immutability")
+
+    except Exception as e:
+        print(f"✗ Error testing report config immutability: {e}")
+        return False
+
+
+def _report(checks, title):
+    """Print each check and return whether all passed."""
+    passed = True
+    for ok, description in checks:
+        print(f"  {'✓' if ok else '✗'} {description}")
+        passed = passed and ok
+    print(f"{'✓' if passed else '✗'} {title} {'passed' if passed else 'failed'}")
+    return passed
+
+
+def main():
+    """Run all tests."""
+    print("PDF Reports Generator - Pipeline Optimization Test")
+    print("=" * 50)
+
+    tests = [
+        test_parameter_substitution,
+        test_optimize_pipeline,
+        test_project_early,
+        test_pivot_accumulator,
+        test_row_extractor,
+        test_report_config_unchanged,
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test in tests:
+        if test():
+            passed += 1
+        print()
+
+    print("=" * 50)
+    print(f"Test Results: {passed}/{total} tests passed")
+
+    if passed == total:
+        print("✓ All tests passed! Pipeline optimizations are working.")
+        return 0
+    else:
+        print("✗ Some tests failed. Please check the errors above.")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())